@@ -0,0 +1,87 @@
+# Measures how many captcha images one core renders per second in each render mode, and where the
+# time goes: the renderer's own stage timings, plus optionally cProfile's hottest functions.
+#
+#   python -m benchmarks.captcha_benchmark --images 500
+#   python -m benchmarks.captcha_benchmark --modes fast --profile 15
+#   python -m benchmarks.captcha_benchmark --samples /tmp/captchas   # write a few images of each mode to compare
+
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import random
+import time
+from typing import Dict, List
+
+from utils.moderation import CAPTCHA_RENDER_MODES, Captcha
+
+STAGES = ("background", "text", "clutter", "filter", "encode")
+
+async def render(captcha: Captcha, texts: List[str], timings: Dict[str, float]) -> int:
+    """Render every text, returns the total size of the images in bytes"""
+    size = 0
+    for text in texts:
+        size += len(await captcha._generate_captcha_image(text, timings))
+    return size
+
+def benchmark_mode(mode: str, images: int, seed: int, profile: int) -> None:
+    captcha = Captcha(render_mode=mode)
+    random.seed(seed)
+    texts = [asyncio.run(captcha._generate_captcha_text()) for _ in range(images)]
+
+    asyncio.run(render(captcha, texts[:20], {}))  # warm up fonts and Pillow's codecs
+
+    timings: Dict[str, float] = {}
+    profiler = cProfile.Profile() if profile else None
+    random.seed(seed)
+    if profiler:
+        profiler.enable()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    size = asyncio.run(render(captcha, texts, timings))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    if profiler:
+        profiler.disable()
+
+    print(f"{mode}: {images / cpu:.1f} images/s per core, {cpu / images * 1000:.2f} ms cpu and {wall / images * 1000:.2f} ms wall per image, {size / images / 1024:.1f} KiB average")
+    staged = sum(timings.values())
+    for stage in STAGES:
+        spent = timings.get(stage, 0.0)
+        print(f"  {stage:<11} {spent / images * 1000:>7.3f} ms {spent / staged:>6.1%}")
+    if profiler:
+        print()
+        pstats.Stats(profiler).sort_stats("tottime").print_stats(profile)
+
+def write_samples(directory: str, count: int, seed: int) -> None:
+    os.makedirs(directory, exist_ok=True)
+    for mode in CAPTCHA_RENDER_MODES:
+        captcha = Captcha(render_mode=mode)
+        random.seed(seed)
+        for i in range(count):
+            text = asyncio.run(captcha._generate_captcha_text())
+            with open(os.path.join(directory, f"{mode}_{i}_{text}.png"), "wb") as f:
+                f.write(asyncio.run(captcha._generate_captcha_image(text)))
+    print(f"Wrote {count} images per mode to {directory}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark captcha rendering per render mode")
+    parser.add_argument("--images", type=int, default=300, help="Images rendered per mode")
+    parser.add_argument("--modes", default=",".join(CAPTCHA_RENDER_MODES), help="Comma separated render modes to compare")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, every mode renders the same texts")
+    parser.add_argument("--profile", type=int, default=0, metavar="N", help="Also print the N functions with the most cProfile time")
+    parser.add_argument("--samples", metavar="DIR", help="Write sample images of every mode to DIR instead of benchmarking")
+    args = parser.parse_args()
+
+    if args.samples:
+        return write_samples(args.samples, 5, args.seed)
+
+    for mode in args.modes.split(","):
+        if mode not in CAPTCHA_RENDER_MODES:
+            raise SystemExit(f"Unknown render mode {mode!r}, choose from {', '.join(CAPTCHA_RENDER_MODES)}")
+        benchmark_mode(mode, args.images, args.seed, args.profile)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# Compares memory use of the gateway profiles at a given number of guilds.
+# Synthetic GUILD_CREATE and MESSAGE_CREATE payloads are fed straight into discord.py's
+# connection state, the events Discord would send for the profile's intents, then RSS is read.
+# Each profile and guild count runs in its own process.
+#
+#   python -m benchmarks.gateway_memory --guilds 100,1000,5000
+
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+
+import discord
+from discord.ext import commands
+
+from utils import GATEWAY_PROFILES, gateway_options
+
+BOT_ID = 768208737013071883
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1024 / 1024
+    except OSError:
+        # ru_maxrss is the peak, not the current value, but it's all macOS gives us
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage / 1024 / 1024 if sys.platform == "darwin" else usage / 1024
+
+def _user(user_id: int) -> dict:
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None, "global_name": None}
+
+def guild_payload(guild_id: int, channels: int, roles: int, members: int) -> dict:
+    channel_ids = [guild_id * 1000 + i for i in range(channels)]
+    return {
+        "id": str(guild_id),
+        "name": f"guild {guild_id}",
+        "owner_id": str(guild_id + 1),
+        "member_count": members,
+        "large": members > 250,
+        "features": [],
+        "emojis": [],
+        "stickers": [],
+        "roles": [
+            {"id": str(guild_id + i), "name": f"role {i}", "permissions": "0", "position": i, "color": 0,
+             "hoist": False, "managed": False, "mentionable": False}
+            for i in range(roles)
+        ],
+        "channels": [
+            {"id": str(channel_id), "type": 0, "name": f"channel-{i}", "position": i, "permission_overwrites": []}
+            for i, channel_id in enumerate(channel_ids)
+        ],
+        # Without the members intent Discord only sends the bot's own member
+        "members": [{"user": _user(BOT_ID), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}],
+        "voice_states": [],
+        "presences": [],
+        "threads": [],
+        "stage_instances": [],
+        "guild_scheduled_events": [],
+    }
+
+def message_payload(message_id: int, guild_id: int, channel_id: int, author_id: int) -> dict:
+    return {
+        "id": str(message_id),
+        "channel_id": str(channel_id),
+        "guild_id": str(guild_id),
+        "author": _user(author_id),
+        "member": {"roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0},
+        "content": "some chatter that isn't a command " * 3,
+        "timestamp": "2024-01-01T00:00:00+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+async def _measure(profile: str, guilds: int, channels: int, roles: int, messages: int) -> dict:
+    bot = commands.Bot(command_prefix="$", **gateway_options(profile))
+    async with bot:  # sets up the loop that event dispatch needs, without logging in
+        state = bot._connection
+        state.user = discord.ClientUser(state=state, data=_user(BOT_ID))
+        baseline = rss_mb()
+
+        for i in range(guilds):
+            guild_id = 10_000_000 + i * 10_000
+            state._add_guild_from_data(guild_payload(guild_id, channels, roles, members=500))
+
+        sent_messages = 0
+        if state._intents.guild_messages:
+            # Background chatter the bot receives but never uses, one author per message
+            for i in range(guilds):
+                guild_id = 10_000_000 + i * 10_000
+                for j in range(messages):
+                    state.parse_message_create(message_payload(guild_id * 100 + j, guild_id, guild_id * 1000, guild_id * 100 + j))
+                    sent_messages += 1
+
+        return {
+            "profile": profile,
+            "guilds": guilds,
+            "messages": sent_messages,
+            "rss_mb": rss_mb() - baseline,
+            "cached_members": sum(len(guild._members) for guild in state._guilds.values()),
+            "cached_messages": len(state._messages) if state._messages is not None else 0,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gateway profile memory at N simulated guilds")
+    parser.add_argument("--guilds", default="100,1000,5000", help="Comma separated guild counts")
+    parser.add_argument("--channels", type=int, default=20, help="Channels per guild")
+    parser.add_argument("--roles", type=int, default=10, help="Roles per guild")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per guild, for profiles that receive them")
+    parser.add_argument("--profiles", default=",".join(GATEWAY_PROFILES), help="Comma separated profiles")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        profile, guilds = args.worker.split(":")
+        result = asyncio.run(_measure(profile, int(guilds), args.channels, args.roles, args.messages))
+        print(json.dumps(result))
+        return
+
+    print(f"{'profile':<8} {'guilds':>7} {'messages':>9} {'rss MB':>8} {'members':>8} {'messages cached':>16}")
+    for guilds in args.guilds.split(","):
+        for profile in args.profiles.split(","):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.gateway_memory", "--worker", f"{profile}:{guilds}",
+                 "--channels", str(args.channels), "--roles", str(args.roles), "--messages", str(args.messages)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{result['profile']:<8} {result['guilds']:>7} {result['messages']:>9} {result['rss_mb']:>8.1f} "
+                f"{result['cached_members']:>8} {result['cached_messages']:>16}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# Drives the real command callbacks without Discord: interactions are fakes that record
+# what would have been sent, and everything runs against a throwaway database.
+# Run benchmarks from the repository root, e.g. `python -m benchmarks.loop_benchmark`.
+
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+from discord.ext import commands
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+
+class FakeResponse:
+    """Stands in for InteractionResponse, keeping what was sent instead of calling the API"""
+
+    def __init__(self):
+        self._done = False
+        self.sent = []
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, kind: str, **kwargs):
+        if self._done:
+            raise discord.errors.InteractionResponded(None)
+        self._done = True
+        self.sent.append((kind, kwargs))
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond("send_message", content=content, **kwargs)
+
+    async def edit_message(self, **kwargs):
+        await self._respond("edit_message", **kwargs)
+
+    async def send_modal(self, modal):
+        await self._respond("send_modal", modal=modal)
+
+    async def defer(self, **kwargs):
+        await self._respond("defer", **kwargs)
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(("send", dict(content=content, **kwargs)))
+
+class FakeInteraction(discord.Interaction):
+    """
+    An Interaction that never touches the gateway or HTTP. It subclasses the real class so the
+    isinstance checks in handle_errors/cooldown treat it like any other interaction.
+
+    Args:
+        user_id: ID of the simulated user
+        command: Name reported as interaction.command.qualified_name, None for component clicks
+        data: Raw interaction data (e.g. {"values": [...]} for selects)
+        client: Returned as interaction.client, routed component handlers get the bot from it
+    """
+
+    def __init__(self, user_id: int, command: Optional[str] = None, data: Optional[dict] = None, client: Optional[discord.Client] = None):
+        self.id = time.time_ns()
+        self._client = client
+        self.type = discord.InteractionType.application_command if command else discord.InteractionType.component
+        self.user = FakeUser(user_id)
+        self.data = data or {}
+        self.extras = {}
+        self.message = None
+        self.guild_id = None
+        self.channel = None
+        self.command_failed = False
+        self._cs_response = FakeResponse()
+        self._cs_followup = FakeFollowup()
+        self._cs_command = SimpleNamespace(qualified_name=command, name=command) if command else None
+
+    async def edit_original_response(self, **kwargs):
+        self._cs_followup.sent.append(("edit_original_response", kwargs))
+
+async def click(interaction: FakeInteraction, custom_id: str) -> None:
+    """Dispatch a routed component click the way discord.py does"""
+    from utils import RoutedItem
+
+    match = RoutedItem.__discord_ui_compiled_template__.fullmatch(custom_id)
+    item = await RoutedItem.from_custom_id(interaction, discord.ui.Button(custom_id=custom_id), match)
+    if await item.interaction_check(interaction):
+        await item.callback(interaction)
+
+async def _gain(bot, interaction):
+    from cogs.core import gain_cb
+    await gain_cb(interaction, bot)
+
+async def _shop(bot, interaction):
+    from cogs.shop import shop_cb
+    await shop_cb(interaction, bot, True)
+
+async def _shop_page(bot, interaction):
+    await click(interaction, f"r:shop:{interaction.user.id}:1")
+
+async def _subatomic(bot, interaction):
+    from cogs.subatomic import subatomic_cb
+    await subatomic_cb(interaction, bot, True)
+
+async def _probabilize(bot, interaction):
+    await click(interaction, f"r:probabilize:{interaction.user.id}:100")
+
+async def _differentiate(bot, interaction):
+    await click(interaction, f"r:differentiate:{interaction.user.id}:5")
+
+async def _fission(bot, interaction):
+    await click(interaction, f"r:fission_confirm:{interaction.user.id}")
+
+# Flow name -> coroutine taking (bot, interaction)
+FLOWS: Dict[str, Callable[[commands.Bot, FakeInteraction], Awaitable[None]]] = {
+    "gain": _gain,
+    "shop": _shop,
+    "shop_page": _shop_page,
+    "subatomic": _subatomic,
+    "probabilize": _probabilize,
+    "differentiate": _differentiate,
+    "fission": _fission,
+}
+
+# Flows that are button clicks rather than slash commands
+COMPONENT_FLOWS = {"shop_page", "probabilize", "differentiate", "fission"}
+
+async def _prepare_crafting(user_id: int) -> None:
+    from utils import add_data
+    await add_data("currency", user_id, {"energy": 5_000, "quarks": 5})
+
+async def _prepare_fission(user_id: int) -> None:
+    from utils import insert_data
+    # First fission every time: its requirements don't grow and it resets everything it touches
+    await insert_data("resets", {"id": user_id, "fission": 0})
+    await insert_data("currency", {"id": user_id, "energy": 1_500_000, "atoms": {"hydrogen": 1}})
+
+# Flow name -> coroutine taking the user ID, run untimed before the flow so it can succeed
+PREPARE: Dict[str, Callable[[int], Awaitable[None]]] = {
+    "probabilize": _prepare_crafting,
+    "differentiate": _prepare_crafting,
+    "fission": _prepare_fission,
+}
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of samples (q between 0 and 1)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+class Harness:
+    """
+    Args:
+        users: Number of simulated users, picked round robin so per-user cooldowns don't dominate
+        db_path: Database file to use, defaults to a fresh temporary file
+    """
+
+    def __init__(self, users: int = 100, db_path: Optional[str] = None):
+        self.users = users
+        self._tempdir = None
+        if db_path is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix="planck-bench-")
+            db_path = os.path.join(self._tempdir.name, "bench.db")
+        self.db_path = db_path
+        self.bot = None
+        self._next_user = 0
+
+    async def setup(self) -> None:
+        from utils import files
+        files.DB_PATH = self.db_path
+
+        from cogs.core import captcha_manager
+        from utils import ban_index, setup_router
+        import cogs.shop, cogs.subatomic  # registers their component routes
+
+        self.bot = commands.Bot(command_prefix="$", intents=discord.Intents.none())
+        setup_router(self.bot)
+        await ban_index.load()
+        await captcha_manager.load()
+
+        # Simulated users solved a captcha recently, otherwise the first call of every user is a captcha
+        now = time.time()
+        for user_id in self.user_ids():
+            captcha_manager.last_captcha_time[user_id] = now
+
+    def user_ids(self) -> List[int]:
+        return [1_000_000 + i for i in range(self.users)]
+
+    def next_user(self) -> int:
+        user_id = 1_000_000 + self._next_user % self.users
+        self._next_user += 1
+        return user_id
+
+    async def run(self, flow: str, user_id: Optional[int] = None) -> float:
+        """Run one flow and return how long it took in seconds"""
+        elapsed, _ = await self.run_interaction(flow, user_id)
+        return elapsed
+
+    async def run_interaction(self, flow: str, user_id: Optional[int] = None) -> Tuple[float, FakeInteraction]:
+        """
+        Run one flow, recorded in metrics under the flow's name.
+
+        Returns:
+            (seconds it took, the interaction with everything that was sent)
+        """
+        from utils.metrics import track_command
+
+        user_id = user_id or self.next_user()
+        if flow in PREPARE:
+            await PREPARE[flow](user_id)
+
+        interaction = FakeInteraction(user_id, command=None if flow in COMPONENT_FLOWS else flow, client=self.bot)
+        start = time.perf_counter()
+        await track_command(flow, FLOWS[flow], self.bot, interaction)
+        return time.perf_counter() - start, interaction
+
+    async def close(self) -> None:
+        if self.bot is not None:
+            await self.bot.close()
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
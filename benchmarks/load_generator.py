@@ -0,0 +1,105 @@
+# Drives a mix of concurrent traffic through the real command callbacks and database, then reports
+# throughput, latency percentiles and database operations per flow.
+#
+#   python -m benchmarks.load_generator --requests 2000 --concurrency 50 --users 300
+#   python -m benchmarks.load_generator --mix gain=1 --users 20   # gain spam, mostly cooldown hits
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+from benchmarks.harness import FLOWS, Harness, percentile
+
+DEFAULT_MIX = "gain=40,shop=8,shop_page=7,subatomic=10,probabilize=15,differentiate=12,fission=8"
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        flow, _, weight = part.partition("=")
+        if flow not in FLOWS:
+            raise SystemExit(f"Unknown flow {flow!r}, choose from {', '.join(FLOWS)}")
+        weights[flow] = float(weight or 1)
+    return weights
+
+async def generate_load(requests: int, concurrency: int, users: int, mix: Dict[str, float], seed: int) -> None:
+    from utils import metrics
+
+    harness = Harness(users=users)
+    await harness.setup()
+    rng = random.Random(seed)
+    user_ids = harness.user_ids()
+    flows = list(mix)
+    weights = list(mix.values())
+
+    try:
+        # Warm up caches and JSON reads, then measure from a clean slate
+        for flow in flows:
+            for user_id in user_ids[:5]:
+                await harness.run(flow, user_id)
+        db_before = metrics.db_per_command()
+        errors_before = dict(metrics.command_errors)
+
+        samples: Dict[str, List[float]] = {flow: [] for flow in flows}
+        unanswered: Dict[str, int] = {flow: 0 for flow in flows}
+        crashed: Dict[str, int] = {flow: 0 for flow in flows}  # raised past handle_errors (or while preparing)
+        crash_reasons: Dict[str, int] = {}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(flow: str, user_id: int):
+            async with semaphore:
+                try:
+                    elapsed, interaction = await harness.run_interaction(flow, user_id)
+                except Exception as e:
+                    crashed[flow] += 1
+                    reason = f"{flow}: {type(e).__name__}: {e}"
+                    crash_reasons[reason] = crash_reasons.get(reason, 0) + 1
+                    return
+            samples[flow].append(elapsed)
+            if not interaction.response.sent and not interaction.followup.sent:
+                unanswered[flow] += 1
+
+        plan = [(rng.choices(flows, weights)[0], rng.choice(user_ids)) for _ in range(requests)]
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one(flow, user_id) for flow, user_id in plan))
+        wall = time.perf_counter() - wall_start
+
+        db_after = metrics.db_per_command()
+    finally:
+        await harness.close()
+
+    print(f"{requests} requests, {concurrency} concurrent, {users} users: {requests / wall:.1f} req/s over {wall:.2f}s\n")
+    print(
+        f"{'flow':<14} {'calls':>6} {'errors':>6} {'silent':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'db ops':>7} {'db ms':>7}"
+    )
+    for flow in flows:
+        calls = len(samples[flow])
+        if not calls:
+            continue
+        db_calls = db_after.get(flow, (0, 0.0))[0] - db_before.get(flow, (0, 0.0))[0]
+        db_time = db_after.get(flow, (0, 0.0))[1] - db_before.get(flow, (0, 0.0))[1]
+        errors = metrics.command_errors.get(flow, 0) - errors_before.get(flow, 0) + crashed[flow]
+        print(
+            f"{flow:<14} {calls:>6} {errors:>6} {unanswered[flow]:>6} "
+            f"{percentile(samples[flow], 0.50) * 1000:>8.2f} {percentile(samples[flow], 0.95) * 1000:>8.2f} "
+            f"{percentile(samples[flow], 0.99) * 1000:>8.2f} {db_calls / calls:>7.1f} {db_time / calls * 1000:>7.2f}"
+        )
+    print("\nsilent: interactions that finished without sending anything. db ops/ms are per call")
+    for reason, count in sorted(crash_reasons.items(), key=lambda item: -item[1]):
+        print(f"{count}x {reason}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate concurrent command traffic against a temporary database")
+    parser.add_argument("--requests", type=int, default=1000, help="Total flows to run")
+    parser.add_argument("--concurrency", type=int, default=25, help="Flows in flight at once")
+    parser.add_argument("--users", type=int, default=200, help="Simulated users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma separated flow=weight pairs")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the traffic plan")
+    args = parser.parse_args()
+
+    asyncio.run(generate_load(args.requests, args.concurrency, args.users, parse_mix(args.mix), args.seed))
+
+if __name__ == "__main__":
+    main()
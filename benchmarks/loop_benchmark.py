@@ -0,0 +1,91 @@
+# Compares the stock asyncio loop with uvloop on the gain/shop/subatomic flows.
+# Each loop runs in its own process so the loop policy and CPU accounting don't leak between runs.
+#
+#   python -m benchmarks.loop_benchmark --iterations 500 --concurrency 20
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import FLOWS, Harness, percentile
+
+async def _run_worker(iterations: int, concurrency: int, users: int) -> dict:
+    harness = Harness(users=users)
+    await harness.setup()
+
+    # Warm up caches, JSON reads and the database before measuring
+    for flow in FLOWS:
+        for _ in range(min(users, 20)):
+            await harness.run(flow)
+
+    results = {}
+    try:
+        for flow in FLOWS:
+            samples = []
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with semaphore:
+                    samples.append(await harness.run(flow))
+
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(iterations)))
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+
+            results[flow] = {
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+                "throughput": iterations / wall,
+                "cpu_ms_per_call": cpu / iterations * 1000,
+            }
+    finally:
+        await harness.close()
+    return results
+
+def run_worker(loop: str, iterations: int, concurrency: int, users: int) -> None:
+    from utils import install_event_loop
+
+    in_use = install_event_loop(loop)
+    results = asyncio.run(_run_worker(iterations, concurrency, users))
+    print(json.dumps({"loop": in_use, "results": results}))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare event loop implementations on the command flows")
+    parser.add_argument("--iterations", type=int, default=300, help="Calls per flow")
+    parser.add_argument("--concurrency", type=int, default=10, help="Calls in flight at once")
+    parser.add_argument("--users", type=int, default=200, help="Simulated users")
+    parser.add_argument("--loops", default="asyncio,uvloop", help="Comma separated loops to compare")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args.worker, args.iterations, args.concurrency, args.users)
+
+    reports = []
+    for loop in args.loops.split(","):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.loop_benchmark", "--worker", loop,
+             "--iterations", str(args.iterations), "--concurrency", str(args.concurrency), "--users", str(args.users)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        if report["loop"] != loop:
+            print(f"{loop} is not available, skipping")
+            continue
+        reports.append(report)
+
+    print(f"{'loop':<8} {'flow':<10} {'p50 ms':>8} {'p99 ms':>8} {'calls/s':>9} {'cpu ms/call':>12}")
+    for report in reports:
+        for flow, result in report["results"].items():
+            print(
+                f"{report['loop']:<8} {flow:<10} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                f"{result['throughput']:>9.1f} {result['cpu_ms_per_call']:>12.3f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# Times the storage helpers in utils/files.py, the level formula, multipliers and shop prices in
+# isolation, against a throwaway database with a small and a large table.
+# Results can be saved as the baseline, later runs are compared against it and exit with status 1
+# if any case got slower than the allowed regression.
+#
+#   python -m benchmarks.micro_benchmark --save                 # record benchmarks/baselines/micro_benchmark.json
+#   python -m benchmarks.micro_benchmark --max-regression 0.25  # fail if a case is over 25% slower
+#   python -m benchmarks.micro_benchmark --only files            # cases whose name contains "files"
+#
+# Baselines are only comparable on the machine that recorded them, re-save after changing hardware.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.harness import FakeUser
+
+BASELINE_PATH = "benchmarks/baselines/micro_benchmark.json"
+
+SMALL_ROWS = 100
+LARGE_ROWS = 50_000
+LEVELS = (1, 10, 50, 150)  # calculate_level_from_xp walks every level below the player's
+
+# Mixes all three increment kinds so one call covers every branch
+PRICE_ITEM = {
+    "price": {"energy": 1_000, "quarks": 5, "electrons": 2},
+    "increments": {"energy": "x1.5", "quarks": "+3", "electrons": "%20"},
+}
+
+Case = Callable[[], Awaitable[object]]
+
+async def _fill_table(table: str, rows: int) -> None:
+    from utils import insert_many
+
+    for start in range(0, rows, 5_000):
+        await insert_many(table, [
+            {"id": user_id, "energy": user_id % 1_000, "quarks": 0, "atoms": {"hydrogen": user_id % 7}}
+            for user_id in range(start + 1, min(rows, start + 5_000) + 1)
+        ])
+
+async def build_cases() -> Dict[str, Case]:
+    """Create the tables the cases read and return {case name: coroutine function}"""
+    from cogs.shop import calculate_current_price
+    from utils.upgrades import MultiplierManager
+    from utils import (
+        add_data, calculate_level_from_xp, calculate_xp_for_level,
+        get_user_data, insert_data, user_exists,
+    )
+
+    tables = {"small": ("bench_small", SMALL_ROWS), "large": ("bench_large", LARGE_ROWS)}
+    for table, rows in tables.values():
+        await _fill_table(table, rows)
+
+    cases: Dict[str, Case] = {}
+    for size, (table, rows) in tables.items():
+        # Spread reads and writes over the table instead of hitting one cached page
+        def user_ids(rows=rows):
+            step = 0
+            while True:
+                step += 1
+                yield step * 7919 % rows + 1  # 7919 is prime, so every row comes up
+
+        ids = user_ids()
+        cases[f"files.get_user_data[{size}]"] = lambda table=table, ids=ids: get_user_data(table, next(ids))
+        cases[f"files.user_exists[{size}]"] = lambda table=table, ids=ids: user_exists(table, next(ids))
+        cases[f"files.user_exists_missing[{size}]"] = lambda table=table, rows=rows: user_exists(table, rows + 1)
+        cases[f"files.insert_data[{size}]"] = lambda table=table, ids=ids: insert_data(table, {"id": next(ids), "energy": 5})
+        cases[f"files.add_data[{size}]"] = lambda table=table, ids=ids: add_data(table, next(ids), {"energy": 1})
+
+    async def level_from_xp(xp: int):
+        return calculate_level_from_xp(xp)
+
+    for level in LEVELS:
+        xp = calculate_xp_for_level(level) + 1
+        cases[f"formulas.calculate_level_from_xp[level {level}]"] = lambda xp=xp: level_from_xp(xp)
+
+    player = FakeUser(2_000_000)
+    await insert_data("profile", {"id": player.id, "xp": calculate_xp_for_level(50) + 1})
+    await insert_data("upgrades", {"id": player.id, "energy_manipulator": 5, "undercharged": 3, "subatomic_efficiency": 1})
+    await insert_data("resets", {"id": player.id, "fission": 4})
+
+    # A fresh manager per call reads upgrades, resets and profile, a reused one only does the math
+    cached = MultiplierManager(player)
+    await cached.get_full_multiplier("energy")
+    cases["upgrades.get_full_multiplier[fresh]"] = lambda: MultiplierManager(player).get_full_multiplier("energy")
+    cases["upgrades.get_full_multiplier[cached]"] = lambda: cached.get_full_multiplier("energy")
+
+    cases["shop.calculate_current_price[count 25]"] = lambda: calculate_current_price(PRICE_ITEM, 25)
+    return cases
+
+async def time_case(case: Case, repeats: int, min_time: float) -> Tuple[float, float]:
+    """
+    Run a case in batches sized so each takes at least min_time.
+
+    Returns:
+        (best seconds per call, median seconds per call) over the batches
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            await case()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    per_call = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            await case()
+        per_call.append((time.perf_counter() - start) / number)
+    return min(per_call), statistics.median(per_call)
+
+def _over_limit(baseline: Optional[dict], name: str, best_us: float, max_regression: float) -> bool:
+    recorded = (baseline or {}).get("cases", {}).get(name)
+    return recorded is not None and best_us / recorded["best_us"] - 1 > max_regression
+
+async def run_benchmarks(only: Optional[str], repeats: int, min_time: float, baseline: Optional[dict] = None, max_regression: float = 0.25, retries: int = 2) -> Dict[str, Dict[str, float]]:
+    """
+    Time every case. Cases over max_regression against the baseline are timed again up to retries
+    times, keeping their best result, so one noisy batch on a busy machine doesn't fail the run.
+    """
+    from utils import files
+
+    with tempfile.TemporaryDirectory(prefix="planck-micro-") as tempdir:
+        files.DB_PATH = os.path.join(tempdir, "micro.db")
+        cases = await build_cases()
+
+        results = {}
+        for name, case in cases.items():
+            if only and only not in name:
+                continue
+            best, median = await time_case(case, repeats, min_time)
+            for _ in range(retries):
+                if not _over_limit(baseline, name, best * 1_000_000, max_regression):
+                    break
+                retry_best, retry_median = await time_case(case, repeats, min_time)
+                if retry_best < best:
+                    best, median = retry_best, retry_median
+            results[name] = {"best_us": best * 1_000_000, "median_us": median * 1_000_000}
+            print(f"{name:<48} {best * 1_000_000:>11.2f} {median * 1_000_000:>11.2f}", flush=True)
+    return results
+
+def load_baseline(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_baseline(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    baseline = load_baseline(path) or {}
+    cases = baseline.get("cases", {})
+    cases.update(results)  # a filtered run only replaces the cases it ran
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "machine": f"{platform.machine()} {platform.processor() or platform.system()}",
+            "python": platform.python_version(),
+            "cases": dict(sorted(cases.items())),
+        }, f, indent=4)
+        f.write("\n")
+
+def compare(baseline: dict, results: Dict[str, Dict[str, float]], max_regression: float) -> List[str]:
+    """Print each case against the baseline, returns the names of cases over max_regression"""
+    if baseline.get("python") != platform.python_version():
+        print(f"Note: baseline was recorded on Python {baseline.get('python')}, this is {platform.python_version()}")
+
+    print(f"\n{'case':<48} {'baseline us':>11} {'now us':>11} {'change':>8}")
+    regressions = []
+    for name, result in results.items():
+        recorded = baseline.get("cases", {}).get(name)
+        if recorded is None:
+            print(f"{name:<48} {'-':>11} {result['best_us']:>11.2f} {'new':>8}")
+            continue
+        change = result["best_us"] / recorded["best_us"] - 1
+        flag = ""
+        if change > max_regression:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<48} {recorded['best_us']:>11.2f} {result['best_us']:>11.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark storage helpers and formulas against stored baselines")
+    parser.add_argument("--only", help="Only run cases whose name contains this")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed batches per case, the best one counts")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per batch")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed slowdown against the baseline, 0.25 is 25%%")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare against or save to")
+    parser.add_argument("--save", action="store_true", help="Save the results as the new baseline instead of comparing")
+    parser.add_argument("--retries", type=int, default=2, help="Times a case over the limit is re-run before it counts as a regression")
+    args = parser.parse_args()
+
+    baseline = None if args.save else load_baseline(args.baseline)
+    print(f"{'case':<48} {'best us':>11} {'median us':>11}")
+    results = asyncio.run(run_benchmarks(args.only, args.repeats, args.min_time, baseline, args.max_regression, args.retries))
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"\nSaved {len(results)} cases to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}, run with --save to record one")
+        return
+
+    regressions = compare(baseline, results, args.max_regression)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNo case regressed by more than {args.max_regression:.0%}")
+
+if __name__ == "__main__":
+    main()
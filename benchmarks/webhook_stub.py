@@ -0,0 +1,152 @@
+# Points the WebhookDispatcher at a local aiohttp server that answers with scripted 429s, 5xx
+# responses and exhausted rate limit buckets, then checks batching, message size limits, the 400
+# fallback, Retry-After, backoff and the queue bound from what the server received. Exits with status 1 if a check fails.
+#
+#   python -m benchmarks.webhook_stub
+
+import asyncio
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from aiohttp import web
+
+from utils.webhooks import (
+    MAX_EMBED_CHARS_PER_MESSAGE, MAX_EMBEDS_PER_MESSAGE, MAX_FIELD_VALUE_CHARS,
+    WebhookDispatcher, _embed_length,
+)
+
+class StubServer:
+    """
+    Answers each path from its script in order, then with 204s, and records every request.
+    Like Discord, messages over the size limits or holding an embed titled "bad..." get a 400.
+    """
+
+    def __init__(self):
+        self.scripts: Dict[str, List[Tuple[int, Dict[str, str]]]] = {}
+        self.requests: List[Tuple[float, str, List[str], int]] = []  # (time, path, embed titles, status)
+        self.lengths: List[int] = []  # total embed characters per request
+        self._runner = None
+        self.base_url = ""
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        script = self.scripts.get(request.path)
+        status, headers = script.pop(0) if script else (204, {})
+        length = sum(_embed_length(embed) for embed in body["embeds"])
+        self.lengths.append(length)
+        too_long = any(len(field["value"]) > MAX_FIELD_VALUE_CHARS for embed in body["embeds"] for field in embed.get("fields", ()))
+        if length > MAX_EMBED_CHARS_PER_MESSAGE or too_long or any(embed["title"].startswith("bad") for embed in body["embeds"]):
+            status, headers = 400, {}
+        self.requests.append((time.perf_counter(), request.path, [embed["title"] for embed in body["embeds"]], status))
+        if status == 429 and "Retry-After" not in headers:
+            return web.json_response({"retry_after": 0.3}, status=429)  # Discord's body-only form
+        return web.Response(status=status, headers=headers)
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/{name}", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+    def delivered(self) -> List[str]:
+        return [title for _, _, titles, status in self.requests if status in (200, 204) for title in titles]
+
+    def gap_after(self, path: str, status: int) -> float:
+        """Seconds between the first response with status on path and the next request to path"""
+        times = [(at, answered) for at, request_path, _, answered in self.requests if request_path == path]
+        for (at, answered), (next_at, _) in zip(times, times[1:]):
+            if answered == status:
+                return next_at - at
+        return 0.0
+
+failures = []
+
+def check(name: str, passed: bool, detail: str = "") -> None:
+    print(f"{'ok  ' if passed else 'FAIL'} {name}{f' ({detail})' if detail else ''}")
+    if not passed:
+        failures.append(name)
+
+async def batching_and_retries(server: StubServer) -> None:
+    server.scripts = {
+        "/a": [(429, {"Retry-After": "0.5"}), (503, {}), (204, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.3"})],
+        "/b": [(429, {})],
+    }
+    dispatcher = WebhookDispatcher(max_retries=3)
+    sent = [f"a{i}" for i in range(23)] + [f"b{i}" for i in range(4)] + [f"a{i}" for i in range(23, 26)]
+    for title in sent:
+        dispatcher.send(f"{server.base_url}/{title[0]}", {"title": title})
+    await dispatcher.close(timeout=30)
+
+    delivered = server.delivered()
+    check("every embed delivered exactly once", sorted(delivered) == sorted(sent), f"{len(delivered)}/{len(sent)}")
+    largest = max(len(titles) for _, _, titles, _ in server.requests)
+    check(f"messages hold at most {MAX_EMBEDS_PER_MESSAGE} embeds", largest <= MAX_EMBEDS_PER_MESSAGE, f"largest {largest}")
+    check("first message packs a full batch", len(server.requests[0][2]) == MAX_EMBEDS_PER_MESSAGE)
+    check("Retry-After header respected", server.gap_after("/a", 429) >= 0.5, f"{server.gap_after('/a', 429):.2f}s")
+    check("retry_after body respected", server.gap_after("/b", 429) >= 0.3, f"{server.gap_after('/b', 429):.2f}s")
+    check("5xx backs off", server.gap_after("/a", 503) >= 1.0, f"{server.gap_after('/a', 503):.2f}s")
+    check("empty bucket waited out", server.gap_after("/a", 204) >= 0.3, f"{server.gap_after('/a', 204):.2f}s")
+
+async def size_limits(server: StubServer) -> None:
+    server.requests, server.lengths = [], []
+    server.scripts = {}
+    dispatcher = WebhookDispatcher(max_retries=3)
+    url = f"{server.base_url}/sized"
+    sent = [f"ok{i}" for i in range(4)] + ["bad0"] + [f"ok{i}" for i in range(4, 8)]
+    for title in sent:
+        dispatcher.send(url, {"title": title})
+    for i in range(6):  # a /ban reason or /verify answer far over the field limit
+        dispatcher.send(url, {"title": f"long{i}", "fields": [{"name": "Reason", "value": "x" * 5000}]})
+    await dispatcher.close(timeout=30)
+
+    delivered = server.delivered()
+    expected = [title for title in sent if title != "bad0"] + [f"long{i}" for i in range(6)]
+    check("a rejected batch loses only the bad embed", sorted(delivered) == sorted(expected), f"{len(delivered)}/{len(expected)}")
+    check("messages stay under the character limit", max(server.lengths) <= MAX_EMBED_CHARS_PER_MESSAGE, f"largest {max(server.lengths)}")
+
+async def queue_bound(server: StubServer) -> None:
+    server.requests = []
+    server.scripts = {"/slow": [(429, {"Retry-After": "1"}), (204, {}), (429, {"Retry-After": "1"})]}
+    dispatcher = WebhookDispatcher(max_retries=3, queue_size=20)
+    url = f"{server.base_url}/slow"
+    dispatcher.send(url, {"title": "first"})
+    await asyncio.sleep(0.2)  # the worker is now waiting out the first 429
+
+    for i in range(100):
+        dispatcher.send(url, {"title": f"flood{i}"})
+    check("full queue drops instead of growing", dispatcher.dropped == 80, f"{dispatcher.dropped} dropped")
+
+    await asyncio.sleep(1.3)  # first went through, the worker took one batch and hit the second 429
+    check("worker holds one batch outside the queue", dispatcher._queue.qsize() == 20 - MAX_EMBEDS_PER_MESSAGE, f"{dispatcher._queue.qsize()} still queued")
+    for i in range(100, 200):
+        dispatcher.send(url, {"title": f"flood{i}"})
+    check("queue stays the only buffer while stalled again", dispatcher.dropped == 170, f"{dispatcher.dropped} dropped")
+
+    await dispatcher.close(timeout=30)
+    check("queued embeds still delivered", len(server.delivered()) == 31, f"{len(server.delivered())} delivered")
+
+async def main():
+    server = StubServer()
+    await server.start()
+    try:
+        await batching_and_retries(server)
+        await size_limits(server)
+        await queue_bound(server)
+    finally:
+        await server.stop()
+
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+if __name__ == "__main__":
+    asyncio.run(main())
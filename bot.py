@@ -1,20 +1,154 @@
 import asyncio
 import os
+import signal
+import time
 
-import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 
-from utils import setup_logging, get_logger
+from utils import (
+    CogReloader,
+    LoopMonitor,
+    checkpoint_db,
+    gateway_options,
+    get_logger,
+    install_event_loop,
+    metrics,
+    setup_logging,
+    setup_router,
+    start_metrics_server,
+    stop_logging,
+    sync_command_tree,
+    webhook_dispatcher
+)
 
+process_start = time.perf_counter()
+
+# Before anything reads the environment (launcher workers have already loaded it, this is a no-op there)
+load_dotenv()
 setup_logging()
 logger = get_logger(__name__)
 
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix='$', intents=intents, shard_id=0, shard_count=2)
+# EVENT_LOOP=uvloop swaps in uvloop when it's installed. Set here so launcher workers get it too
+event_loop = install_event_loop(os.getenv("EVENT_LOOP", "asyncio"))
+
+# GATEWAY_PROFILE=full brings back message content and the default caches, for prefix commands
+gateway_profile = os.getenv("GATEWAY_PROFILE", "slash")
+
+# Set by launcher.py when running as one worker of a cluster.
+# Without them discord.py asks Discord for the recommended shard count and runs every shard here.
+shard_count = os.getenv("SHARD_COUNT")
+shard_ids = os.getenv("SHARD_IDS")
+
+# How long shutdown waits for running commands before closing anyway
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "20"))
+
+def log_timeline(event: str):
+    logger.info(f"[startup +{time.perf_counter() - process_start:.2f}s] {event}")
+
+class PlanckBot(commands.AutoShardedBot):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.ready_count = 0
+        self.metrics_runner = None
+        self.loop_monitor = None
+        self.reloader_task = None
+        self._shutdown_task = None
+
+    async def setup_hook(self):
+        # Runs once per process, unlike on_ready which fires again after every reconnect
+        log_timeline(f"Logged in ({event_loop} loop), loading extensions")
+        setup_router(self)
+        await register_commands()
+        log_timeline(f"Loaded {len(self.extensions)} extensions")
+
+        # In a cluster only the first worker talks to Discord about commands
+        if os.getenv("CLUSTER_WORKER", "0") == "0":
+            await sync_command_tree(self)
+            log_timeline("Command tree checked")
+
+        self.loop_monitor = LoopMonitor(debug_slow_callbacks=os.getenv("LOOP_DEBUG", "0") == "1")
+        self.loop_monitor.start()
+
+        metrics_port = os.getenv("METRICS_PORT")
+        if metrics_port:
+            # Each cluster worker gets its own port
+            self.metrics_runner = await start_metrics_server(int(metrics_port) + int(os.getenv("CLUSTER_WORKER", "0")))
+
+        if os.getenv("COG_HOT_RELOAD", "0") == "1":
+            self.reloader_task = self.loop.create_task(CogReloader(self).run())
+            logger.info("Cog hot reload enabled")
+
+        try:
+            self.loop.add_signal_handler(signal.SIGTERM, lambda: self.loop.create_task(self.close()))
+        except NotImplementedError:
+            pass  # Windows, only Ctrl+C is handled there
+
+    async def close(self):
+        if self._shutdown_task is None:
+            self._shutdown_task = asyncio.create_task(self.shutdown())
+        await self._shutdown_task
+        await super().close()
+
+    async def shutdown(self):
+        """
+        Stop taking new interactions, let running commands finish, then flush and stop everything
+        that would otherwise lose state. Each step is timed, and a failing step doesn't stop the rest
+        """
+        shutdown_start = time.perf_counter()
+        logger.info("Shutting down...")
+
+        async def step(name, coro):
+            step_start = time.perf_counter()
+            try:
+                await coro
+            except Exception as e:
+                logger.error(f"[shutdown] {name} failed: {e}")
+            else:
+                logger.info(f"[shutdown] {name} ({(time.perf_counter() - step_start) * 1000:.0f}ms)")
+
+        async def disconnect_shards():
+            # No gateway connection means no new interactions, while HTTP stays up for the running ones
+            for shard in self.shards.values():
+                await shard.disconnect()
+
+        async def drain():
+            deadline = time.perf_counter() + SHUTDOWN_TIMEOUT
+            while metrics.in_flight and time.perf_counter() < deadline:
+                await asyncio.sleep(0.1)
+            if metrics.in_flight:
+                logger.warning(f"[shutdown] {metrics.in_flight} commands still running after {SHUTDOWN_TIMEOUT:.0f}s")
+
+        async def stop_background_tasks():
+            if self.reloader_task:
+                self.reloader_task.cancel()
+            if self.loop_monitor:
+                self.loop_monitor.stop()
+
+        async def unload_extensions():
+            # cog_unload cancels the cog's tasks and saves cooldowns, captchas are saved as they change
+            for name in list(self.extensions):
+                await self.unload_extension(name)
+
+        async def stop_metrics_server():
+            if self.metrics_runner:
+                await self.metrics_runner.cleanup()
+
+        await step("Disconnected from the gateway", disconnect_shards())
+        await step("Drained running commands", drain())
+        await step("Stopped background tasks", stop_background_tasks())
+        await step("Unloaded extensions", unload_extensions())
+        await step("Flushed webhooks", webhook_dispatcher.close())
+        await step("Stopped metrics server", stop_metrics_server())
+        await step("Checkpointed database", checkpoint_db())
+        logger.info(f"Shutdown finished in {time.perf_counter() - shutdown_start:.2f}s")
 
-last_modified = {}
+bot = PlanckBot(
+    command_prefix='$',
+    **gateway_options(gateway_profile),
+    shard_count=int(shard_count) if shard_count else None,
+    shard_ids=[int(shard_id) for shard_id in shard_ids.split(",")] if shard_ids else None
+)
 
 async def register_commands():
     logger.info("Registering commands...")
@@ -26,66 +160,25 @@ async def register_commands():
             except Exception as e:
                 logger.error(f"Failed to load extension {filename[:-3]}: {e}")
 
-async def reload_cog(cog_name):
-    try:
-        await bot.reload_extension(f"cogs.{cog_name}")
-        print(f"Reloaded {cog_name}")
-        await bot.tree.sync()
-        print("Synced commands")
-    except Exception as e:
-        print(f"Error reloading {cog_name}: {e}")
-
-async def watch_cogs():
-    print(f"Watching for changes in: {os.path.abspath('./cogs')}")
-    
-    for filename in os.listdir("./cogs"):
-        if filename.endswith(".py") and not filename.startswith("__"):
-            path = os.path.join("./cogs", filename)
-            last_modified[path] = os.path.getmtime(path)
-    
-    while True:
-        for filename in os.listdir("./cogs"):
-            if filename.endswith(".py") and not filename.startswith("__"):
-                path = os.path.join("./cogs", filename)
-                current_mtime = os.path.getmtime(path)
-                
-                if path in last_modified and current_mtime > last_modified[path]:
-                    last_modified[path] = current_mtime
-                    await reload_cog(filename[:-3])
-        
-        await asyncio.sleep(1)
-
-async def cleanup_expired_captchas_task():
-    await bot.wait_until_ready()
-    while not bot.is_closed():
-        try:
-            from cogs.core import captcha_manager
-            await captcha_manager.cleanup_expired_captchas()
-        except Exception as e:
-            print(f"Error in captcha cleanup task: {e}")
-        await asyncio.sleep(30)
-
 @bot.event
 async def on_ready():
+    bot.ready_count += 1
+    if bot.ready_count > 1:
+        logger.info(f"Reconnected (ready #{bot.ready_count}), skipping setup")
+        return
+
+    log_timeline("Ready")
     logger.info(f'{bot.user} has connected to Discord!')
-    logger.info(f'Bot is in {len(bot.guilds)} guilds')
-    logger.info(f'With {len(bot.users)} users')
-    
-    await register_commands()
-    await bot.tree.sync()
-    logger.info("Command tree synced")
-    
-    bot.loop.create_task(watch_cogs())
-    bot.loop.create_task(cleanup_expired_captchas_task())
-    logger.info("Background tasks started")
+    logger.info(f'Bot is in {len(bot.guilds)} guilds ({gateway_profile} gateway profile)')
 
-@bot.event
-async def on_message(message):
-    if message.author == bot.user:
-        return
-    await bot.process_commands(message)
+if gateway_profile == "full":
+    @bot.event
+    async def on_message(message):
+        if message.author == bot.user:
+            return
+        await bot.process_commands(message)
 
 if __name__ == "__main__":
-    load_dotenv()
     TOKEN = os.getenv("TOKEN")
-    bot.run(TOKEN)
\ No newline at end of file
+    bot.run(TOKEN)
+    stop_logging()
\ No newline at end of file
@@ -1,3 +1,5 @@
+import asyncio
+import os
 import random
 import time
 
@@ -6,17 +8,29 @@ from discord import app_commands
 from discord.ext import commands
 
 from utils import (
+    BanManager,
     Captcha,
+    LEADERBOARD_SIZE,
+    Paginator,
     add_data,
+    ban_index,
     base_view,
     calculate_level_from_xp,
     cb,
+    cooldown,
+    cooldowns,
     full_chances,
     full_multipliers,
+    get_dropped_log_count,
     get_user_data,
     get_version,
-    insert_data,
+    help_pages,
+    leaderboards,
+    metrics,
     moderate,
+    route,
+    routed_button,
+    routed_select,
     universal_command,
     get_logger,
     handle_errors
@@ -27,37 +41,36 @@ logger = get_logger(__name__)
 start = time.time()
 captcha_manager = Captcha()
 
-@handle_errors()
-async def check_page_requirements(user_id: int, requirement: str = None) -> bool:
-    """Check if a user has completed the required tutorial"""
-    if not requirement:
-        return True
-    
-    profile = await get_user_data("profile", user_id, {})
-    tutorials = profile.get("tutorials", [])
-    
-    return requirement in tutorials
+_guild_totals = {"at": 0.0, "guilds": 0, "members": 0}
 
+def guild_totals(bot: commands.Bot) -> tuple:
+    """
+    Guild and member counts, recomputed at most once a minute.
+    The member cache is off, so member_count from GUILD_CREATE is the only user count available
+    """
+    now = time.time()
+    if now - _guild_totals["at"] > 60:
+        guilds = bot.guilds
+        _guild_totals["guilds"] = len(guilds)
+        _guild_totals["members"] = sum(guild.member_count or 0 for guild in guilds)
+        _guild_totals["at"] = now
+    return _guild_totals["guilds"], _guild_totals["members"]
+
+@route("gain")
 @moderate()
 @handle_errors()
 async def gain_cb(interaction: discord.Interaction, bot: commands.Bot = None):
     user_id = interaction.user.id
     view, container = await base_view(interaction)
 
-    profile_data = await get_user_data("profile", user_id)
-    now = time.time()
-    last_gain = profile_data.get("last_gain", 0) if profile_data else 0
-
-    if now - last_gain < 2:
+    retry_after = cooldowns.consume("gain", user_id, per=2)
+    if retry_after:
         container.add_item(discord.ui.TextDisplay(
-            f"Please wait {2 - (now - last_gain):.2f}s before gaining again."
+            f"Please wait {retry_after:.2f}s before gaining again."
         ))
         return await interaction.response.send_message(view=view, ephemeral=True)
-    else:        
-        profile_data = await get_user_data("profile", user_id)
-        if profile_data:
-            profile_data["last_gain"] = now
-            await insert_data("profile", profile_data)
+    else:
+        profile_data = await get_user_data("profile", user_id, {})
 
         level_info = calculate_level_from_xp(profile_data.get("xp", 0))
         level = level_info["level"]
@@ -98,7 +111,7 @@ async def gain_cb(interaction: discord.Interaction, bot: commands.Bot = None):
         xp_multiplier = await full_multipliers("xp", user=interaction.user)
         total_xp = energy_gained + (quarks_gained * 3) + (electrons_gained * 25)
         total_xp = int(total_xp * xp_multiplier)
-        await add_data("profile", user_id, {"xp": total_xp, "gains": 1})
+        await add_data("profile", user_id, {"xp": total_xp, "gains": 1, "name": interaction.user.name})
         
         quark_result = await get_user_data("currency", user_id)
         total_quarks = quark_result.get("quarks", 0) if quark_result else 0
@@ -118,20 +131,18 @@ async def gain_cb(interaction: discord.Interaction, bot: commands.Bot = None):
     container.add_item(discord.ui.Separator())
     action_row = discord.ui.ActionRow()
 
-    gain = discord.ui.Button(label="Gain")
-    menu = discord.ui.Button(label="Menu")
+    gain = routed_button("gain", user_id=user_id, label="Gain")
+    menu = routed_button("menu", user_id=user_id, label="Menu")
 
     action_row.add_item(gain)
     action_row.add_item(menu)
 
-    gain.callback = lambda inter: gain_cb(inter, bot)
-    menu.callback = lambda inter: menu_cb(inter, bot)
-
     container.add_item(action_row)
 
     await cb(interaction, view, True)
 
 
+@route("multipliers")
 @moderate()
 @handle_errors()
 async def multipliers_cb(interaction: discord.Interaction, bot: commands.Bot = None, is_command: bool = False):
@@ -150,12 +161,12 @@ async def multipliers_cb(interaction: discord.Interaction, bot: commands.Bot = N
     ))
     container.add_item(discord.ui.Separator())
     action_row = discord.ui.ActionRow()
-    back = discord.ui.Button(label="Back")
+    back = routed_button("profile", user_id=interaction.user.id, label="Back")
     action_row.add_item(back)
-    back.callback = lambda inter: profile_cb(inter, bot)
     container.add_item(action_row)
     await cb(interaction, view, is_command)
 
+@route("resets")
 @moderate()
 @handle_errors()
 async def resets_cb(interaction: discord.Interaction, bot: commands.Bot = None, is_command: bool = False):
@@ -174,12 +185,12 @@ async def resets_cb(interaction: discord.Interaction, bot: commands.Bot = None,
 
     container.add_item(discord.ui.Separator())
     action_row = discord.ui.ActionRow()
-    back = discord.ui.Button(label="Back")
+    back = routed_button("profile", user_id=interaction.user.id, label="Back")
     action_row.add_item(back)
-    back.callback = lambda inter: profile_cb(inter, bot)
     container.add_item(action_row)
     await cb(interaction, view, is_command)
 
+@route("profile")
 @moderate()
 @handle_errors()
 async def profile_cb(interaction: discord.Interaction, bot: commands.Bot = None, is_command: bool = False):
@@ -200,20 +211,17 @@ async def profile_cb(interaction: discord.Interaction, bot: commands.Bot = None,
     container.add_item(discord.ui.Separator())
     action_row = discord.ui.ActionRow()
 
-    multipliers = discord.ui.Button(label="Multipliers")
-    resets = discord.ui.Button(label="Resets")
-    back = discord.ui.Button(label="Back")
+    multipliers = routed_button("multipliers", user_id=user_id, label="Multipliers")
+    resets = routed_button("resets", user_id=user_id, label="Resets")
+    back = routed_button("menu", user_id=user_id, label="Back")
 
     action_row.add_item(multipliers)
     action_row.add_item(resets)
     action_row.add_item(back)
-
-    multipliers.callback = lambda inter: multipliers_cb(inter, bot)
-    resets.callback = lambda inter: resets_cb(inter, bot)
-    back.callback = lambda inter: menu_cb(inter, bot)
     container.add_item(action_row)
     await cb(interaction, view, is_command)
 
+@route("info")
 @moderate()
 @handle_errors()
 async def info_cb(interaction: discord.Interaction, bot: commands.Bot = None, is_command: bool = False):
@@ -225,36 +233,67 @@ async def info_cb(interaction: discord.Interaction, bot: commands.Bot = None, is
         seconds = seconds % 60
         return f"{hours}h {minutes}m {seconds}s"
     
+    guild_count, member_count = guild_totals(bot)
     container.add_item(discord.ui.TextDisplay(
         "This bot is developed by <@721151215010054165>\n"
         f"**Runtime**: {runtime(int(time.time() - start))}\n"
-        f"**Guilds**: {len(bot.guilds):,}\n"
-        f"**Users**: {len(bot.users):,}\n"
+        f"**Guilds**: {guild_count:,}\n"
+        f"**Members**: {member_count:,}\n"
         f"**Shards**: {bot.shard_count}\n"
         f"**Version**: {get_version()}"
     ))
     container.add_item(discord.ui.Separator())
     action_row = discord.ui.ActionRow()
-    help = discord.ui.Button(label="Help")
-    back = discord.ui.Button(label="Back")
+    help = routed_button("help", user_id=interaction.user.id, label="Help")
+    back = routed_button("menu", user_id=interaction.user.id, label="Back")
     action_row.add_item(discord.ui.Button(label="Website", url="https://planck-bot.github.io/", style=discord.ButtonStyle.link))
     action_row.add_item(discord.ui.Button(label="Discord", url="https://discord.gg/SbXtQDQYhf", style=discord.ButtonStyle.link))
     action_row.add_item(discord.ui.Button(label="Invite", url="https://discord.com/oauth2/authorize?client_id=768208737013071883", style=discord.ButtonStyle.link))
     action_row.add_item(help)
     action_row.add_item(back)
-    help.callback = lambda inter: help_cb(inter, bot)
-    back.callback = lambda inter: menu_cb(inter, bot)
     container.add_item(action_row)
     await cb(interaction, view, is_command)
 
+@handle_errors()
+async def stats_cb(interaction: discord.Interaction, bot: commands.Bot = None, is_command: bool = False):
+    view, container = await base_view(interaction)
+
+    db_totals = metrics.db_per_command()
+    command_lines = []
+    busiest = sorted(metrics.command_latency.items(), key=lambda item: item[1].count, reverse=True)[:10]
+    for command, histogram in busiest:
+        db_calls, db_time = db_totals.get(command, (0, 0.0))
+        command_lines.append(
+            f"`{command}` {histogram.count:,} calls | "
+            f"p50 {histogram.quantile(0.5) * 1000:.0f}ms p99 {histogram.quantile(0.99) * 1000:.0f}ms | "
+            f"{db_calls / histogram.count:.1f} db calls ({db_time / histogram.count * 1000:.1f}ms) | "
+            f"{metrics.command_errors.get(command, 0)} errors"
+        )
+
+    cache_lines = []
+    for cache in sorted(set(metrics.cache_hits) | set(metrics.cache_misses)):
+        hits = metrics.cache_hits.get(cache, 0)
+        total = hits + metrics.cache_misses.get(cache, 0)
+        cache_lines.append(f"`{cache}` {hits / total * 100:.1f}% hit ({total:,} lookups)")
+
+    container.add_item(discord.ui.TextDisplay(
+        "**Commands** (latency is bucketed)\n" + ("\n".join(command_lines) or "No commands recorded yet.") + "\n\n"
+        "**Caches**\n" + ("\n".join(cache_lines) or "No cache lookups yet.") + "\n\n"
+        f"**Loop lag**: p50 {metrics.loop_lag.quantile(0.5) * 1000:.0f}ms p99 {metrics.loop_lag.quantile(0.99) * 1000:.0f}ms | "
+        f"{metrics.counters.get('loop_stalls', 0):,} stalls\n"
+        f"**Auto defers**: {metrics.counters.get('auto_defers', 0):,} ({metrics.counters.get('auto_defer_missed_modals', 0):,} modals too late)\n"
+        f"**Dropped log records**: {get_dropped_log_count():,}"
+    ))
+    await cb(interaction, view, is_command)
+
+@route("menu")
 @moderate()
 @handle_errors()
 async def menu_cb(interaction: discord.Interaction, bot: commands.Bot = None, is_command: bool = False):
-    from .shop import shop_cb
-    from .subatomic import subatomic_cb
+    user_id = interaction.user.id
     view, container = await base_view(interaction)
     action_row = discord.ui.ActionRow()
-    subatomic = discord.ui.Button(label="Subatomic")
+    subatomic = routed_button("subatomic", user_id=user_id, label="Subatomic")
     atomic = discord.ui.Button(label="Atomic")
 
     action_row.add_item(subatomic)
@@ -263,17 +302,15 @@ async def menu_cb(interaction: discord.Interaction, bot: commands.Bot = None, is
         # After a user gets their first atom?
         action_row.add_item(atomic)
 
-    subatomic.callback = lambda inter: subatomic_cb(inter, bot)
-
     container.add_item(action_row)
 
     action_row = discord.ui.ActionRow()
 
-    gain = discord.ui.Button(label="Gain")
-    profile = discord.ui.Button(label="Profile")
-    info = discord.ui.Button(label="Info")
-    leaderboard = discord.ui.Button(label="Leaderboard")
-    shop = discord.ui.Button(label="Shop")
+    gain = routed_button("gain", user_id=user_id, label="Gain")
+    profile = routed_button("profile", user_id=user_id, label="Profile")
+    info = routed_button("info", user_id=user_id, label="Info")
+    leaderboard = routed_button("leaderboard", user_id=user_id, label="Leaderboard")
+    shop = routed_button("shop", user_id=user_id, label="Shop")
 
     action_row.add_item(gain)
     action_row.add_item(profile)
@@ -281,186 +318,105 @@ async def menu_cb(interaction: discord.Interaction, bot: commands.Bot = None, is
     action_row.add_item(leaderboard)
     action_row.add_item(shop)
 
-    gain.callback = lambda inter: gain_cb(inter, bot)
-    profile.callback = lambda inter: profile_cb(inter, bot)
-    info.callback = lambda inter: info_cb(inter, bot)
-    leaderboard.disabled = True
-    shop.callback = lambda inter: shop_cb(inter, bot)
-    # leaderboard.callback = lambda inter: leaderboard_cb(inter)
-
     container.add_item(action_row)
     await cb(interaction, view, is_command)
 
+LEADERBOARD_PAGE_SIZE = 10
+
+def format_score(board: str, score: float) -> str:
+    if board == "xp":
+        return f"Level {calculate_level_from_xp(int(score))['level']} ({int(score):,} XP)"
+    return f"{int(score):,} {leaderboards.boards[board].label.lower()}"
+
+@route("leaderboard")
+@moderate()
+@handle_errors()
+async def leaderboard_cb(interaction: discord.Interaction, bot: commands.Bot = None, is_command: bool = False, board_name: str = "xp", page: int = 0):
+    user_id = interaction.user.id
+    board = await leaderboards.get(board_name)
+    ranking = board.ranking()
+
+    header_container = discord.ui.Container()
+    rank = board.rank(user_id)
+    header_container.add_item(discord.ui.TextDisplay(
+        f"**Leaderboard: {board.label}**\n" +
+        (f"Your rank: #{rank}" if rank else f"You're not in the top {LEADERBOARD_SIZE}")
+    ))
+
+    async def build_page(start: int, end: int) -> list:
+        container = discord.ui.Container()
+        first = start * LEADERBOARD_PAGE_SIZE
+        lines = [
+            f"**#{first + position}** {leaderboards.name_of(ranked_id)}: {format_score(board_name, score)}"
+            for position, (ranked_id, score) in enumerate(ranking[first:first + LEADERBOARD_PAGE_SIZE], start=1)
+        ]
+        container.add_item(discord.ui.TextDisplay("\n".join(lines) or "Nobody is on this leaderboard yet."))
+        return [container]
+
+    footer_components = []
+    select_row = discord.ui.ActionRow()
+    select_row.add_item(routed_select(
+        "leaderboard_board",
+        user_id=user_id,
+        placeholder="Choose a leaderboard...",
+        options=[
+            discord.SelectOption(label=option.label, value=name, default=(name == board_name))
+            for name, option in leaderboards.boards.items()
+        ]
+    ))
+    footer_components.append(select_row)
+
+    button_row = discord.ui.ActionRow()
+    button_row.add_item(routed_button("menu", user_id=user_id, label="Back"))
+    footer_components.append(button_row)
+
+    # One paginator item per page of players
+    page_count = max(1, (len(ranking) - 1) // LEADERBOARD_PAGE_SIZE + 1)
+    paginator = Paginator(
+        interaction, per_page=1, header_container=header_container, footer_components=footer_components,
+        item_count=page_count, page_factory=build_page, page_route="leaderboard_page", page_route_args=(board_name,)
+    )
+    paginator.current_page = min(max(page, 0), page_count - 1)
+    await paginator.send(is_command)
+
+@route("leaderboard_page")
+async def leaderboard_page_cb(interaction: discord.Interaction, bot: commands.Bot, board_name: str, page: str):
+    await leaderboard_cb(interaction, bot, False, board_name, int(page))
+
+@route("leaderboard_board")
+async def leaderboard_board_cb(interaction: discord.Interaction, bot: commands.Bot):
+    await leaderboard_cb(interaction, bot, False, interaction.data["values"][0])
+
 # @moderate()
+@route("help")
 @handle_errors()
 async def help_cb(interaction: discord.Interaction, bot: commands.Bot = None, is_command: bool = False, stage: str = None, page = "Main"):
+    await help_pages.ensure_loaded()
     view, container = await base_view(interaction)
-
-    help_content = {
-        "main": {
-            "title": "Help",
-            "description": (
-                "**Main Commands:**\n"
-                "</gain:1411612232399327293> - Gain matter. This is the command you will use to get anything\n"
-                "</profile:1411619125154811966> - View your profile\n"
-                "</info:1411592664331190384> - Get information about the bot\n"
-                "</ticket:1411940922333200497> - Create a ticket either to report or appeal\n\n"
-                "Select a stage below to get specific help for that stage!"
-            )
-        },
-        "shop": {
-            "title": "Shop",
-            "pages": {
-                "Regular": {
-                    "title": "Regular Shop",
-                    "content": (
-                        "This is the regular shop!\n\n"
-                        "┌─You will only use energy and quarks here\n"
-                        "└─Upgrades may seem small, but they add up!"
-                    )
-                }
-            }
-        },
-        "subatomic": {
-            "title": "Subatomic",
-            "pages": {
-                "Main": {
-                    "title": "Getting Started",
-                    "content": (
-                        "Welcome to the subatomic stage! This is the beginning of the game.\n\n"
-                        "┌─Use </gain:1412981220635312249> to start gaining energy\n"
-                        "├─Energy is the basic currency in this stage\n"
-                        "├─Gain experience (XP) with each action to level up\n"
-                        "└─ └─Higher levels unlock new features and multipliers"
-                    )
-                },
-                "Probabilize": {
-                    "title": "First steps",
-                    "content": (
-                        "</subatomic probabilize:1412151005088448542> is how you will gain quarks!\n\n"
-                        "┌─Has a chance (5% base) to convert energy into quarks!\n"
-                        "│  └─You can upgrade the chance using shop upgrades\n"
-                        "│      └─Some might even allow you to get quarks from </gain:1412981220635312249>!\n"
-                        "└─You will also need to **differentiate** them later!"
-                    ),
-                    "requirement": "probabilize_tutorial"
-                },
-                "Differentiate": {
-                    "title": "How to tell apart quarks",
-                    "content": (
-                        "</subatomic differentiate:1412151005088448542> is how you will tell apart quarks!\n\n"
-                        "┌─Allows you to create up and down quarks\n"
-                        "├─They will be used to create **protons** and **neutrons**\n"
-                        "├─You will also unlock more types of quarks later on!\n"
-                        "├─Here is the chance table:\n"
-                        "│  │─Up Quarks: 75%\n"
-                        "│  │─Down Quarks: 75%\n"
-                        "│  │─Strange Quarks: 0.1%\n"
-                        "│  │─Charm Quarks: 0.01%\n"
-                        "│  │─Bottom Quarks: 0.01%\n"
-                        "└─ └─Top Quarks: 0.001%"
-                    ),
-                    "requirement": "differentiate_tutorial"
-                },
-                "Condenser": {
-                    "title": "Zip Zap Electricity",
-                    "content": (
-                        "</subatomic condense:1412151005088448542> is how you're going to make electrons\n\n"
-                        "┌─Requires a LOT of energy (1000)\n"
-                        "├─Electrons will be used to create **atoms** later!\n"
-                        "└─There will also be shop items you can buy with them."
-                    ),
-                    "requirement": "condenser_tutorial"
-                },
-                "Hadronization": {
-                    "title": "Making Protons and Neutrons",
-                    "content": (
-                        "</subatomic hadronize:1412151005088448542> is how you're going to make protons and neutrons!\n\n"
-                        "┌─Requires up and down quarks\n"
-                        "├─Protons require 2 up quarks and 1 down quark\n"
-                        "├─Neutrons require 1 up quark and 2 down quarks\n"
-                        "└─ └─You will need these to make atoms later on!"
-                    ),
-                    "requirement": "hadronization_tutorial"
-                },
-                "Nucleosynthesis": {
-                    "title": "Making Atoms",
-                    "content": (
-                        "</subatomic nucleosynthesize:1412151005088448542> is how you're going to make atoms!\n\n"
-                        "┌─Requires protons, neutrons, and electrons\n"
-                        "├─ └─1 proton + 1 neutron + 1 electron = Hydrogen\n"
-                        "└─Atoms are the final product of this stage"
-                    ),
-                    "requirement": "nucleosynthesis_tutorial"
-                },
-                "Fission": {
-                    "title": "First of many",
-                    "content": (
-                        "</subatomic fission:1412151005088448542> is the first reset layer.\n\n"
-                        "┌─Fission will reset all currencies except atoms and special quarks\n"
-                        "├─It will also reset all upgrades and XP (previous to fission)\n"
-                        "├─You will gain photons (depends on your fission amount), which boost energy and quark gain by 10% each\n"
-                        "├─ └─You will be able to spend photons using the </shop photons:1412981220635312257>\n"
-                        "├─Differentiated quarks become 1% more common per fission\n"
-                        "├─You will also gain 10% more XP per fission\n"
-                        "├─Your next fissions require atoms that cost more\n"
-                        "├─ └─The cost of fission also increases exponentially\n"
-                        "├─As a one time bonus, you get 5% quark chance and 1% electron chance\n"
-                        "└─ └─This is only for your first fission\n"
-                    ),
-                    "requirement": "fission_tutorial"
-                }
-            }
-        }
-    }
+    user_id = interaction.user.id
 
     if stage is None:
-        content = help_content["main"]
-        container.add_item(discord.ui.TextDisplay(
-            f"**{content['title']}**\n\n{content['description']}"
-        ))
+        container.add_item(discord.ui.TextDisplay(help_pages.main_text))
         
         container.add_item(discord.ui.Separator())
         stage_row = discord.ui.ActionRow()
-        stage_select = discord.ui.Select(
+        stage_select = routed_select(
+            "help_stage",
+            user_id=user_id,
             placeholder="Select a stage for specific help...",
-            options=[
-                discord.SelectOption(
-                    label="Subatomic", 
-                    description="The beginning game! Good luck, have fun!", 
-                    value="subatomic", 
-                    emoji="<:energy:1412139064559140956>"
-                ),
-                discord.SelectOption(
-                    label="Shop", 
-                    description="The shop provides many important upgrades!", 
-                    value="shop", 
-                    emoji="🏪"
-                ),
-            ]
+            options=list(help_pages.main_options)
         )
-        stage_select.callback = lambda inter: help_stage_select_cb(inter, bot)
         stage_row.add_item(stage_select)
         container.add_item(stage_row)
         
         back_row = discord.ui.ActionRow()
-        back = discord.ui.Button(label="Back")
-        back.callback = lambda inter: info_cb(inter, bot)
+        back = routed_button("info", user_id=user_id, label="Back")
         back_row.add_item(back)
         container.add_item(back_row)
         
     else:
-        stage_data = help_content.get(stage, {})
-        pages = stage_data.get("pages", {})
-        
-        user_id = interaction.user.id
-        accessible_pages = {}
-        for page_key, page_data in pages.items():
-            requirements = page_data.get("requirement", {})
-            if await check_page_requirements(user_id, requirements):
-                accessible_pages[page_key] = page_data
-        
-        page_keys = list(accessible_pages.keys())
+        accessible_pages = await help_pages.accessible_pages(stage, user_id)
+        page_keys = [accessible_page.key for accessible_page in accessible_pages]
         total_pages = len(accessible_pages)
         
         if isinstance(page, int):
@@ -469,48 +425,28 @@ async def help_cb(interaction: discord.Interaction, bot: commands.Bot = None, is
             else:
                 current_page_key = page_keys[0] if page_keys else None
         else:
-            current_page_key = page if page in accessible_pages else (page_keys[0] if page_keys else None)
+            current_page_key = page if page in page_keys else (page_keys[0] if page_keys else None)
         
-        if current_page_key and current_page_key in accessible_pages:
-            page_data = accessible_pages[current_page_key]
+        if current_page_key:
             current_page_index = page_keys.index(current_page_key) + 1
             container.add_item(discord.ui.TextDisplay(
-                f"**{stage_data['title']}**\n\n"
-                f"**{page_data['title']}**\n{page_data['content']}\n\n"
+                help_pages.page(stage, current_page_key).text +
                 f"Page {current_page_index}/{total_pages} ({current_page_key})"
             ))
         else:
-            current_page_key = None
+            stage_title = help_pages.stages[stage].title if stage in help_pages.stages else stage.title()
             container.add_item(discord.ui.TextDisplay(
-                f"**{stage_data['title']}**\n\nPage not found!"
+                f"**{stage_title}**\n\nPage not found!"
             ))
         
         container.add_item(discord.ui.Separator())
         stage_row = discord.ui.ActionRow()
-        stage_select = discord.ui.Select(
+        stage_select = routed_select(
+            "help_stage",
+            user_id=user_id,
             placeholder="Switch to another stage...",
-            options=[
-                discord.SelectOption(
-                    label="Subatomic", 
-                    description="The beginning game! Good luck, have fun!", 
-                    value="subatomic", 
-                    emoji="<:energy:1412139064559140956>"
-                ),
-                discord.SelectOption(
-                    label="Main Help", 
-                    description="Go back to the main help page", 
-                    value="main", 
-                    emoji="📚"
-                ),
-                discord.SelectOption(
-                    label="Shop", 
-                    description="The shop provides many important upgrades!", 
-                    value="shop", 
-                    emoji="🏪"
-                ),
-            ]
+            options=list(help_pages.stage_options)
         )
-        stage_select.callback = lambda inter: help_stage_select_cb(inter, bot)
         stage_row.add_item(stage_select)
         container.add_item(stage_row)
         
@@ -523,25 +459,30 @@ async def help_cb(interaction: discord.Interaction, bot: commands.Bot = None, is
                 
                 for page_key in row_page_keys:
                     btn_style = discord.ButtonStyle.primary if page_key == current_page_key else discord.ButtonStyle.secondary
-                    page_btn = discord.ui.Button(
+                    page_btn = routed_button(
+                        "help_page", stage, page_key,
+                        user_id=user_id,
                         label=page_key,
                         style=btn_style,
                         disabled=(page_key == current_page_key)
                     )
-                    page_btn.callback = lambda inter, p=page_key: help_cb(inter, bot, False, stage, p)
                     page_row.add_item(page_btn)
                 
                 container.add_item(page_row)
         
         back_row = discord.ui.ActionRow()
-        back = discord.ui.Button(label="Back")
-        back.callback = lambda inter: help_cb(inter, bot, False)
+        back = routed_button("help", user_id=user_id, label="Back")
         back_row.add_item(back)
         container.add_item(back_row)
 
 
     await cb(interaction, view, is_command)
 
+@route("help_page")
+async def help_page_cb(interaction: discord.Interaction, bot: commands.Bot, stage: str, page: str):
+    await help_cb(interaction, bot, False, stage, page)
+
+@route("help_stage")
 @handle_errors()
 async def help_stage_select_cb(interaction: discord.Interaction, bot: commands.Bot):
     """Handle stage selection from the dropdown"""
@@ -555,9 +496,43 @@ async def help_stage_select_cb(interaction: discord.Interaction, bot: commands.B
 class GlobalCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.captcha_expiry_task = None
+        self.ban_sweeper_task = None
+        self.ban_refresh_task = None
+        self.cooldown_persist_task = None
+        self.leaderboard_task = None
+
+    async def cog_load(self):
+        if not ban_index.loaded:
+            await ban_index.load()
+        # Captcha state lives in the database, so a cog reload picks up where the old instance left off
+        await captcha_manager.load()
+        self.captcha_expiry_task = asyncio.create_task(captcha_manager.run_expiry_scheduler())
+        self.ban_sweeper_task = asyncio.create_task(BanManager.run_ban_sweeper())
+        await cooldowns.load()
+        await help_pages.load()
+        await leaderboards.load()
+        self.leaderboard_task = asyncio.create_task(leaderboards.run_reconciliation())
+        self.cooldown_persist_task = asyncio.create_task(cooldowns.run_persistence())
+        if os.getenv("CLUSTER_WORKER"):
+            # Other workers share the ban table, so keep this process's index from going stale
+            self.ban_refresh_task = asyncio.create_task(ban_index.run_refresh())
+
+    async def cog_unload(self):
+        if self.captcha_expiry_task:
+            self.captcha_expiry_task.cancel()
+        if self.ban_sweeper_task:
+            self.ban_sweeper_task.cancel()
+        if self.ban_refresh_task:
+            self.ban_refresh_task.cancel()
+        if self.cooldown_persist_task:
+            self.cooldown_persist_task.cancel()
+        if self.leaderboard_task:
+            self.leaderboard_task.cancel()
+        await cooldowns.persist()
 
     @universal_command(name="ping", description="Check the bot ping")
-    # @cooldown(15.0)
+    @cooldown(15.0)
     @handle_errors()
     async def ping_command(self, interaction: discord.Interaction):
         await interaction.response.send_message(f"{self.bot.latency * 1000:.2f} ms")
@@ -572,6 +547,11 @@ class GlobalCog(commands.Cog):
     async def profile_command(self, interaction: discord.Interaction):
         await profile_cb(interaction, self.bot, True)
 
+    @universal_command(name="leaderboard", description="See the top players")
+    @handle_errors()
+    async def leaderboard_command(self, interaction: discord.Interaction):
+        await leaderboard_cb(interaction, self.bot, True)
+
     @universal_command(name="info", description="Get information about the bot")
     @handle_errors()
     async def info_command(self, interaction: discord.Interaction):
@@ -588,6 +568,13 @@ class GlobalCog(commands.Cog):
     async def ticket_command(self, interaction: discord.Interaction, report_type: str, reason_or_evidence: str):
         ...
 
+    @universal_command(name="stats", description="View command latency and database metrics")
+    @handle_errors()
+    async def stats_command(self, interaction: discord.Interaction):
+        if interaction.user.id not in (721151215010054165, ):
+            return await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+        await stats_cb(interaction, self.bot, True)
+
     @universal_command(name="ban", description="Ban a user, extend a ban, or check ban status")
     @app_commands.describe(
         user="The user to ban/check",
@@ -679,37 +666,18 @@ class GlobalCog(commands.Cog):
         if show_regenerate:
             container.add_item(discord.ui.Separator())
             action_row = discord.ui.ActionRow()
-            regen_button = discord.ui.Button(label="Regenerate Captcha")
-            regen_button.callback = lambda inter: self._handle_regenerate(inter, interaction.user.id)
+            regen_button = routed_button("captcha_regen", user_id=interaction.user.id, label="Regenerate Captcha")
             action_row.add_item(regen_button)
             container.add_item(action_row)
             
         return view, container, file
 
-    async def _handle_regenerate(self, interaction: discord.Interaction, user_id: int):
-        if interaction.user.id != user_id:
-            await interaction.response.send_message(
-                "This is not your captcha!", ephemeral=True
-            )
-            return
-            
-        result = await captcha_manager.regenerate_captcha(user_id)
-        if result["success"]:
-            components, file = await captcha_manager.get_captcha_container_and_file(user_id)
-            view, _, _ = await self._create_captcha_view(
-                interaction,
-                components=components,
-                file=file
-            )
-            await interaction.response.edit_message(view=view, attachments=[file])
-        else:
-            await interaction.response.send_message(result["message"], ephemeral=True)
-
     @universal_command(name="verify", description="Verify a captcha or regenerate it")
     @app_commands.describe(captcha="Enter the captcha text or 'REGEN' to regenerate")
     @handle_errors()
     async def verify_command(self, interaction: discord.Interaction, captcha: str):
         user_id = interaction.user.id
+        await captcha_manager.sync_from_table(user_id)  # may have been issued on another worker
         
         if user_id not in captcha_manager.active_captchas:
             view, _, _ = await self._create_captcha_view(
@@ -13,13 +13,15 @@ from utils import (
     get_user_data,
     moderate,
     read_json,
+    route,
+    routed_button,
+    routed_select,
     handle_errors,
     get_logger
 )
 
 logger = get_logger(__name__)
 
-@handle_errors() # redundant but whatever
 def sanitize_item_name(item_name: str) -> str:
     """Convert item name to database-safe format (lowercase with underscores)"""
     return item_name.lower().replace(" ", "_").replace("-", "_")
@@ -127,96 +129,84 @@ async def shop_cb(interaction: discord.Interaction, bot: commands.Bot, is_comman
         f"Electrons: {current_electrons:,}\n"
     ))
 
-    item_containers = []
-    for item_name in unlocked_items:
-        item_data = shop_data["regular"][item_name]
-        current_count = await get_user_upgrade_count(user_id, item_name)
-        current_prices = await calculate_current_price(item_data, current_count)
-        
-        container = discord.ui.Container()
-        
-        price_text = []
-        for currency, price in current_prices.items():
-            price_text.append(f"{price:,} {currency}")
-        price_display = " + ".join(price_text)
-        
-        is_maxed = current_count >= item_data["max"]
-        has_enough_currency = True
-        
-        if user_currency:
-            for currency, price in current_prices.items():
-                if user_currency.get(currency, 0) < price:
-                    has_enough_currency = False
-                    break
-        else:
-            has_enough_currency = False
-        
-        if is_maxed:
-            buy_button = discord.ui.Button(
-                label="MAX",
-                style=discord.ButtonStyle.success,
-                disabled=True
-            )
-        elif not has_enough_currency:
-            buy_button = discord.ui.Button(
-                label=f"Need {price_display}",
-                style=discord.ButtonStyle.danger,
-                disabled=True
-            )
-        else:
-            buy_button = discord.ui.Button(
-                label=f"{price_display}",
-                style=discord.ButtonStyle.primary,
-                disabled=False
-            )
-        
-        section = discord.ui.Section(accessory=buy_button)
-        
-        section.add_item(discord.ui.TextDisplay(
-            f"**{item_name.title()}** ({current_count}/{item_data['max']})\n"
-            f"{item_data['description']}\n"
-        ))
-        
-        def create_buy_callback(item, paginator_ref):
-            async def buy_callback(inter):
-                success, message = await buy_item(inter.user, item)
-                if success:
-                    current_page = paginator_ref[0].current_page if paginator_ref[0] else 0
-                    await shop_cb(inter, bot, False, current_page)
-                else:
-                    await inter.response.send_message(f"❌ {message}", ephemeral=True)
-            return buy_callback
-        
-        container._buy_callback_item = item_name
-        container.add_item(section)
-        container._buy_button = buy_button
-        
-        item_containers.append(container)
-    
-    if not item_containers:
+    if not unlocked_items:
         view, container = await base_view(interaction)
         container.add_item(discord.ui.TextDisplay("No items available at your current level."))
         await cb(interaction, view, is_command)
         return
-    
+
     ITEMS_PER_PAGE = 5 # in case i forget
+    page = min(max(preserve_page, 0), (len(unlocked_items) - 1) // ITEMS_PER_PAGE)
+    upgrades = {}  # the upgrades row, read once when the first page is built
+
+    async def build_items(start: int, end: int) -> list:
+        """Build the containers for unlocked_items[start:end], only called for pages that are shown"""
+        if "row" not in upgrades:
+            upgrades["row"] = await get_user_data("upgrades", user_id) or {}
+
+        item_containers = []
+        for item_name in unlocked_items[start:end]:
+            item_data = shop_data["regular"][item_name]
+            current_count = upgrades["row"].get(sanitize_item_name(item_name), 0)
+            current_prices = await calculate_current_price(item_data, current_count)
+            
+            container = discord.ui.Container()
+            
+            price_text = []
+            for currency, price in current_prices.items():
+                price_text.append(f"{price:,} {currency}")
+            price_display = " + ".join(price_text)
+            
+            is_maxed = current_count >= item_data["max"]
+            has_enough_currency = True
+            
+            if user_currency:
+                for currency, price in current_prices.items():
+                    if user_currency.get(currency, 0) < price:
+                        has_enough_currency = False
+                        break
+            else:
+                has_enough_currency = False
+            
+            if is_maxed:
+                label, style = "MAX", discord.ButtonStyle.success
+            elif not has_enough_currency:
+                label, style = f"Need {price_display}", discord.ButtonStyle.danger
+            else:
+                label, style = f"{price_display}", discord.ButtonStyle.primary
+            buy_button = routed_button(
+                "shop_buy", item_name, page,
+                user_id=user_id,
+                label=label,
+                style=style,
+                disabled=is_maxed or not has_enough_currency
+            )
+            
+            section = discord.ui.Section(accessory=buy_button)
+            
+            section.add_item(discord.ui.TextDisplay(
+                f"**{item_name.title()}** ({current_count}/{item_data['max']})\n"
+                f"{item_data['description']}\n"
+            ))
+            
+            container.add_item(section)
+            item_containers.append(container)
+        return item_containers
     
     footer_components = []
     
     button_row = discord.ui.ActionRow()
 
-    gain = discord.ui.Button(label="Gain")
-    back = discord.ui.Button(label="Back")
+    gain = routed_button("gain", user_id=user_id, label="Gain")
+    back = routed_button("menu", user_id=user_id, label="Back")
     button_row.add_item(gain)
     button_row.add_item(back)
 
-    from .core import gain_cb, menu_cb
-    gain.callback = lambda inter: gain_cb(inter, bot)
-    back.callback = lambda inter: menu_cb(inter, bot)
-
     footer_components.append(button_row)
         
-    shop_type_select = discord.ui.Select(
+    shop_type_select = routed_select(
+        "shop_type", page,
+        user_id=user_id,
         placeholder="Choose shop type...",
         options=[
             discord.SelectOption(
@@ -228,28 +218,36 @@ async def shop_cb(interaction: discord.Interaction, bot: commands.Bot, is_comman
         ]
     )
     
-    async def shop_type_callback(interaction_select: discord.Interaction):
-        current_page = paginator.current_page if 'paginator' in locals() else 0
-        await shop_cb(interaction_select, bot, False, current_page)
-    
-    shop_type_select.callback = shop_type_callback
-    
     select_row = discord.ui.ActionRow()
     select_row.add_item(shop_type_select)
     footer_components.append(select_row)
     
-    paginator = Paginator(interaction, item_containers, ITEMS_PER_PAGE, header_container, footer_components)
-    
-    if preserve_page > 0:
-        paginator.current_page = min(preserve_page, (len(item_containers) - 1) // ITEMS_PER_PAGE)
-    
-    paginator_ref = [paginator]
-    for container in item_containers:
-        if hasattr(container, '_buy_button') and hasattr(container, '_buy_callback_item'):
-            container._buy_button.callback = create_buy_callback(container._buy_callback_item, paginator_ref)
+    # Pages are rebuilt from the page number in the button's custom_id, so nothing is prefetched
+    paginator = Paginator(
+        interaction, per_page=ITEMS_PER_PAGE, header_container=header_container, footer_components=footer_components,
+        item_count=len(unlocked_items), page_factory=build_items, page_route="shop"
+    )
+    paginator.current_page = page
     
     await paginator.send(is_command)
 
+@route("shop")
+async def shop_page_cb(interaction: discord.Interaction, bot: commands.Bot, page: str = "0"):
+    await shop_cb(interaction, bot, False, int(page))
+
+@route("shop_type")
+async def shop_type_cb(interaction: discord.Interaction, bot: commands.Bot, page: str = "0"):
+    await shop_cb(interaction, bot, False, int(page))
+
+@route("shop_buy")
+@handle_errors()
+async def shop_buy_cb(interaction: discord.Interaction, bot: commands.Bot, item: str, page: str = "0"):
+    success, message = await buy_item(interaction.user, item)
+    if success:
+        await shop_cb(interaction, bot, False, int(page))
+    else:
+        await interaction.response.send_message(f"❌ {message}", ephemeral=True)
+
 class ShopCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
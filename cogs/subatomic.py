@@ -13,12 +13,16 @@ from utils import (
     full_multipliers,
     get_user_data,
     moderate,
+    route,
+    routed_button,
     handle_errors,
     get_logger
 )
 
 logger = get_logger(__name__)
 
+MODAL_TIMEOUT = 900  # closed modals are never submitted, don't keep their callbacks forever
+
 @moderate()
 @handle_errors()
 async def base_modal(interaction: discord.Interaction, bot: commands.Bot, is_command: bool = False, *, title: str, callback, currencies: list = None, inputs: list = None, selects: list = None):
@@ -62,7 +66,7 @@ async def base_modal(interaction: discord.Interaction, bot: commands.Bot, is_com
                 ))
                 return await cb(interaction, view, is_command)
 
-    modal = discord.ui.Modal(title=title, timeout=None)
+    modal = discord.ui.Modal(title=title, timeout=MODAL_TIMEOUT)
     
     if inputs:
         for input_config in inputs:
@@ -179,25 +183,13 @@ async def probabilize_cb(interaction: discord.Interaction, bot: commands.Bot = N
 
     container.add_item(discord.ui.Separator())
     action_row = discord.ui.ActionRow()
-    retry = discord.ui.Button(label="Retry")
-    retry_amount = discord.ui.Button(label="Retry (Same Amount)")
-    back = discord.ui.Button(label="Back")
+    retry = routed_button("modal", "probabilize", user_id=interaction.user.id, label="Retry")
+    retry_amount = routed_button("probabilize", amount, user_id=interaction.user.id, label="Retry (Same Amount)")
+    back = routed_button("subatomic", user_id=interaction.user.id, label="Back")
 
     action_row.add_item(retry)
     action_row.add_item(retry_amount)
     action_row.add_item(back)
-
-    retry.callback = lambda inter: base_modal(inter, bot, False,
-                                              title="Probabilize Energy",
-                                              callback=probabilize_cb,
-                                              currencies=["energy"],
-                                              inputs=[{
-                                                  "label": "Amount",
-                                                  "placeholder": "Enter amount of energy to probabilize",
-                                                  "key": "amount"
-                                              }])
-    retry_amount.callback = lambda inter: probabilize_cb(inter, bot, amount)
-    back.callback = lambda inter: subatomic_cb(inter, bot)
     container.add_item(action_row)
 
     user_data = await get_user_data("currency", interaction.user.id)
@@ -294,25 +286,13 @@ async def differentiate_cb(interaction: discord.Interaction, bot: commands.Bot =
 
     container.add_item(discord.ui.Separator())
     action_row = discord.ui.ActionRow()
-    retry = discord.ui.Button(label="Retry")
-    retry_amount = discord.ui.Button(label="Retry (Same Amount)")
-    back = discord.ui.Button(label="Back")
+    retry = routed_button("modal", "differentiate", user_id=interaction.user.id, label="Retry")
+    retry_amount = routed_button("differentiate", amount, user_id=interaction.user.id, label="Retry (Same Amount)")
+    back = routed_button("subatomic", user_id=interaction.user.id, label="Back")
 
     action_row.add_item(retry)
     action_row.add_item(retry_amount)
     action_row.add_item(back)
-
-    retry.callback = lambda inter: base_modal(inter, bot, False,
-                                              title="Differentiate Quarks",
-                                              callback=differentiate_cb,
-                                              currencies=["quarks", "energy"],
-                                              inputs=[{
-                                                  "label": "Amount",
-                                                  "placeholder": "Enter amount of quarks to differentiate",
-                                                  "key": "amount"
-                                              }])
-    retry_amount.callback = lambda inter: differentiate_cb(inter, bot, amount)
-    back.callback = lambda inter: subatomic_cb(inter, bot)
     container.add_item(action_row)
 
     retry.disabled = 1 > (user_data.get('quarks', 0) if user_data else 0) or 250 > (user_data.get('energy', 0) if user_data else 0)
@@ -365,25 +345,13 @@ async def condense_cb(interaction: discord.Interaction, bot: commands.Bot = None
 
     container.add_item(discord.ui.Separator())
     action_row = discord.ui.ActionRow()
-    retry = discord.ui.Button(label="Retry")
-    retry_amount = discord.ui.Button(label="Retry (Same Amount)")
-    back = discord.ui.Button(label="Back")
+    retry = routed_button("modal", "condense", user_id=interaction.user.id, label="Retry")
+    retry_amount = routed_button("condense", amount, user_id=interaction.user.id, label="Retry (Same Amount)")
+    back = routed_button("subatomic", user_id=interaction.user.id, label="Back")
 
     action_row.add_item(retry)
     action_row.add_item(retry_amount)
     action_row.add_item(back)
-
-    retry.callback = lambda inter: base_modal(inter, bot, False,
-                                              title="Condense Electrons",
-                                              callback=condense_cb,
-                                              currencies=["energy"],
-                                              inputs=[{
-                                                  "label": "Amount",
-                                                  "placeholder": "Enter amount of electrons to condense",
-                                                  "key": "amount"
-                                              }])
-    retry_amount.callback = lambda inter: condense_cb(inter, bot, amount)
-    back.callback = lambda inter: subatomic_cb(inter, bot)
     container.add_item(action_row)
 
     retry.disabled = 1000 > (user_data.get('energy', 0) if user_data else 0)
@@ -453,29 +421,13 @@ async def hadronize_cb(interaction: discord.Interaction, bot: commands.Bot = Non
 
     container.add_item(discord.ui.Separator())
     action_row = discord.ui.ActionRow()
-    retry = discord.ui.Button(label="Retry")
-    retry_amount = discord.ui.Button(label="Retry (Same Amount)")
-    back = discord.ui.Button(label="Back")
+    retry = routed_button("modal", "hadronize", user_id=interaction.user.id, label="Retry")
+    retry_amount = routed_button("hadronize", protons, neutrons, user_id=interaction.user.id, label="Retry (Same Amount)")
+    back = routed_button("subatomic", user_id=interaction.user.id, label="Back")
 
     action_row.add_item(retry)
     action_row.add_item(retry_amount)
     action_row.add_item(back)
-
-    retry.callback = lambda inter: base_modal(inter, bot, False,
-                                              title="Hadronize Protons and Neutrons",
-                                              callback=hadronize_cb,
-                                              currencies=["energy"],
-                                              inputs=[{
-                                                  "label": "Protons",
-                                                  "placeholder": "Enter amount of protons to hadronize",
-                                                  "key": "protons"
-                                              }, {
-                                                  "label": "Neutrons",
-                                                  "placeholder": "Enter amount of neutrons to hadronize",
-                                                  "key": "neutrons"
-                                              }])
-    retry_amount.callback = lambda inter: hadronize_cb(inter, bot, amount)
-    back.callback = lambda inter: subatomic_cb(inter, bot)
     container.add_item(action_row)
 
     retry.disabled = 2500 > (user_data.get('energy', 0) if user_data else 0) and 1 > (user_data.get('protons', 0) if user_data else 0) and 1 > (user_data.get('neutrons', 0) if user_data else 0)
@@ -643,15 +595,12 @@ async def fission_cb(interaction: discord.Interaction, bot: commands.Bot = None,
         ))
         
         action_row = discord.ui.ActionRow()
-        confirm = discord.ui.Button(label="Yes, perform fission", style=discord.ButtonStyle.danger)
-        cancel = discord.ui.Button(label="No, cancel", style=discord.ButtonStyle.secondary)
+        confirm = routed_button("fission_confirm", user_id=interaction.user.id, label="Yes, perform fission", style=discord.ButtonStyle.danger)
+        cancel = routed_button("subatomic", user_id=interaction.user.id, label="No, cancel", style=discord.ButtonStyle.secondary)
         
         action_row.add_item(confirm)
         action_row.add_item(cancel)
         
-        confirm.callback = lambda inter: fission_cb(inter, bot, confirmed=True)
-        cancel.callback = lambda inter: subatomic_cb(inter, bot)
-        
         container.add_item(action_row)
         return await interaction.response.send_message(view=view)
 
@@ -754,10 +703,102 @@ async def fission_cb(interaction: discord.Interaction, bot: commands.Bot = None,
 
     await interaction.response.send_message(view=view)
 
+# Modals opened from buttons, by the name in the button's custom_id
+MODALS = {
+    "probabilize": dict(
+        title="Probabilize Energy",
+        callback=probabilize_cb,
+        currencies=["energy"],
+        inputs=[{
+            "label": "Amount",
+            "placeholder": "Enter amount of energy to probabilize",
+            "key": "amount"
+        }]
+    ),
+    "differentiate": dict(
+        title="Differentiate Quarks",
+        callback=differentiate_cb,
+        currencies=["quarks", "energy"],
+        inputs=[{
+            "label": "Amount",
+            "placeholder": "Enter amount of quarks to differentiate",
+            "key": "amount"
+        }]
+    ),
+    "condense": dict(
+        title="Condense Electrons",
+        callback=condense_cb,
+        currencies=["energy"],
+        inputs=[{
+            "label": "Amount",
+            "placeholder": "Enter amount of electrons to condense",
+            "key": "amount"
+        }]
+    ),
+    "hadronize": dict(
+        title="Hadronize Protons and Neutrons",
+        callback=hadronize_cb,
+        currencies=["up_quark", "down_quark", "energy"],
+        inputs=[{
+            "label": "Protons",
+            "placeholder": "Enter amount of protons to hadronize",
+            "key": "protons"
+        }, {
+            "label": "Neutrons",
+            "placeholder": "Enter amount of neutrons to hadronize",
+            "key": "neutrons"
+        }]
+    ),
+    "nucleosynthesis": dict(
+        title="Nucleosynthesis",
+        callback=nucleosynthesis_cb,
+        currencies=["energy", "electrons", "protons", "neutrons"],
+        selects=[{
+            "label": "Atom",
+            "options": [{"label": atom.title(), "value": atom} for atom in ATOMS.keys()],
+            "key": "atom"
+        }],
+        inputs=[{
+            "label": "Amount",
+            "placeholder": "Enter amount of atoms to synthesize",
+            "key": "amount"
+        }]
+    ),
+}
+
+@route("modal")
+async def modal_route(interaction: discord.Interaction, bot: commands.Bot, name: str):
+    await base_modal(interaction, bot, False, **MODALS[name])
+
+@route("probabilize")
+async def probabilize_route(interaction: discord.Interaction, bot: commands.Bot, amount: str):
+    await probabilize_cb(interaction, bot, int(amount))
+
+@route("differentiate")
+async def differentiate_route(interaction: discord.Interaction, bot: commands.Bot, amount: str):
+    await differentiate_cb(interaction, bot, int(amount))
+
+@route("condense")
+async def condense_route(interaction: discord.Interaction, bot: commands.Bot, amount: str):
+    await condense_cb(interaction, bot, int(amount))
+
+@route("hadronize")
+async def hadronize_route(interaction: discord.Interaction, bot: commands.Bot, protons: str, neutrons: str):
+    await hadronize_cb(interaction, bot, int(protons), int(neutrons))
+
+@route("fission")
+async def fission_route(interaction: discord.Interaction, bot: commands.Bot):
+    await fission_cb(interaction, bot, confirmed=False)
+
+@route("fission_confirm")
+async def fission_confirm_route(interaction: discord.Interaction, bot: commands.Bot):
+    await fission_cb(interaction, bot, confirmed=True)
+
+@route("subatomic")
 @moderate()
 @handle_errors()
 async def subatomic_cb(interaction: discord.Interaction, bot: commands.Bot = None, is_command: bool = False):
-    from .core import gain_cb, menu_cb
+    user_id = interaction.user.id
     view, container = await base_view(interaction)
 
     container.add_item(discord.ui.TextDisplay(
@@ -778,88 +819,28 @@ async def subatomic_cb(interaction: discord.Interaction, bot: commands.Bot = Non
     container.add_item(discord.ui.Separator())
     subatomic_row = discord.ui.ActionRow()
 
-    probabilize = discord.ui.Button(label="Probabilize")
-
-    probabilize.callback = lambda inter: base_modal(inter, bot, False,
-                                                   title="Probabilize Energy",
-                                                   callback=probabilize_cb,
-                                                   currencies=["energy"],
-                                                   inputs=[{
-                                                       "label": "Amount",
-                                                       "placeholder": "Enter amount of energy to probabilize",
-                                                       "key": "amount"
-                                                   }])
+    probabilize = routed_button("modal", "probabilize", user_id=user_id, label="Probabilize")
     
     if energy > 0:
         subatomic_row.add_item(probabilize)
 
-    differentiate = discord.ui.Button(label="Differentiate")
-
-    differentiate.callback = lambda inter: base_modal(inter, bot, False,
-                                              title="Differentiate Quarks",
-                                              callback=differentiate_cb,
-                                              currencies=["quarks", "energy"],
-                                              inputs=[{
-                                                  "label": "Amount",
-                                                  "placeholder": "Enter amount of quarks to differentiate",
-                                                  "key": "amount"
-                                              }])
+    differentiate = routed_button("modal", "differentiate", user_id=user_id, label="Differentiate")
 
     if quarks > 0 and energy > 249:
         subatomic_row.add_item(differentiate)
 
-    condense = discord.ui.Button(label="Condense")
-
-    condense.callback = lambda inter: base_modal(inter, bot, False,
-                                              title="Condense Electrons",
-                                              callback=condense_cb,
-                                              currencies=["energy"],
-                                              inputs=[{
-                                                  "label": "Amount",
-                                                  "placeholder": "Enter amount of electrons to condense",
-                                                  "key": "amount"
-                                              }])
+    condense = routed_button("modal", "condense", user_id=user_id, label="Condense")
 
     if energy > 999:
         subatomic_row.add_item(condense)
 
-    hadronize = discord.ui.Button(label="Hadronize")
-
-    hadronize.callback = lambda inter: base_modal(inter, bot, False,
-                                              title="Hadronize Protons and Neutrons",
-                                              callback=hadronize_cb,
-                                              currencies=["up_quark", "down_quark", "energy"],
-                                              inputs=[{
-                                                  "label": "Protons",
-                                                  "placeholder": "Enter amount of protons to hadronize",
-                                                  "key": "protons"
-                                              },
-                                              {
-                                                  "label": "Neutrons",
-                                                  "placeholder": "Enter amount of neutrons to hadronize",
-                                                  "key": "neutrons"
-                                              }])
+    hadronize = routed_button("modal", "hadronize", user_id=user_id, label="Hadronize")
 
     hadronize.disabled = True # TODO
     if up_quarks > 1 and down_quarks > 0 and energy > 2499:
         subatomic_row.add_item(hadronize)
 
-    nucleosynthesize = discord.ui.Button(label="Nucleosynthesize")
-
-    nucleosynthesize.callback = lambda inter: base_modal(inter, bot, False,
-                                              title="Nucleosynthesis",
-                                              callback=nucleosynthesis_cb,
-                                              currencies=["energy", "electrons", "protons", "neutrons"],
-                                              selects=[{
-                                                  "label": "Atom",
-                                                  "options": [{"label": atom.title(), "value": atom} for atom in ATOMS.keys()],
-                                                  "key": "atom"
-                                              }],
-                                              inputs=[{
-                                                  "label": "Amount",
-                                                  "placeholder": "Enter amount of atoms to synthesize",
-                                                  "key": "amount"
-                                              }])
+    nucleosynthesize = routed_button("modal", "nucleosynthesis", user_id=user_id, label="Nucleosynthesize")
 
     nucleosynthesize.disabled = True # TODO
     if protons > 0 and neutrons > 0 and electrons > 0 and energy > 4999:
@@ -868,9 +849,9 @@ async def subatomic_cb(interaction: discord.Interaction, bot: commands.Bot = Non
     container.add_item(subatomic_row)
 
     action_row = discord.ui.ActionRow()
-    gain = discord.ui.Button(label="Gain")
-    back = discord.ui.Button(label="Back")
-    fission = discord.ui.Button(label="Fission", style=discord.ButtonStyle.danger) # TODO
+    gain = routed_button("gain", user_id=user_id, label="Gain")
+    back = routed_button("menu", user_id=user_id, label="Back")
+    fission = routed_button("fission", user_id=user_id, label="Fission", style=discord.ButtonStyle.danger) # TODO
 
     action_row.add_item(gain)
     action_row.add_item(back)
@@ -878,9 +859,6 @@ async def subatomic_cb(interaction: discord.Interaction, bot: commands.Bot = Non
     if energy >= 1_000_000 and atoms.get(list(ATOMS.keys())[0], 0) >= 1: # at least 1 hydrogen
         action_row.add_item(fission)
 
-    gain.callback = lambda inter: gain_cb(inter, bot)
-    back.callback = lambda inter: menu_cb(inter, bot)
-    fission.callback = lambda inter: fission_cb(inter, bot, confirmed=False)
     container.add_item(action_row)
 
     await cb(interaction, view, is_command)
@@ -0,0 +1,161 @@
+# Runs the bot as a cluster: N shards split across M worker processes.
+# Each worker runs an AutoShardedBot over its own shard range, and this process
+# supervises them, restarting crashed workers and logging per-shard latency.
+#
+# Usage: python launcher.py --shards 4 --workers 2
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from utils import setup_logging, get_logger
+
+logger = get_logger("launcher")
+
+def split_shards(shard_count: int, worker_count: int) -> List[List[int]]:
+    """Split shard ids into contiguous ranges, one per worker"""
+    worker_count = max(1, min(worker_count, shard_count))
+    base, extra = divmod(shard_count, worker_count)
+    ranges = []
+    start = 0
+    for worker_id in range(worker_count):
+        size = base + (1 if worker_id < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+async def report_latencies(bot, worker_id: int, latency_queue: multiprocessing.Queue, interval: float = 30):
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        latencies = {shard_id: latency for shard_id, latency in bot.latencies}
+        try:
+            latency_queue.put_nowait((worker_id, time.time(), latencies))
+        except queue.Full:
+            pass
+        await asyncio.sleep(interval)
+
+def run_worker(worker_id: int, shard_ids: List[int], shard_count: int, latency_queue: multiprocessing.Queue):
+    load_dotenv()
+    os.environ["SHARD_COUNT"] = str(shard_count)
+    os.environ["SHARD_IDS"] = ",".join(str(shard_id) for shard_id in shard_ids)
+    os.environ["CLUSTER_WORKER"] = str(worker_id)
+
+    from bot import bot # reads the shard settings above when it builds the bot
+
+    async def main():
+        async with bot:
+            asyncio.create_task(report_latencies(bot, worker_id, latency_queue))
+            await bot.start(os.getenv("TOKEN"))
+
+    asyncio.run(main())
+
+class Supervisor:
+    def __init__(self, shard_count: int, worker_count: int, max_backoff: float = 60, stable_after: float = 300):
+        self.shard_count = shard_count
+        self.shard_ranges = split_shards(shard_count, worker_count)
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.context = multiprocessing.get_context("spawn")
+        self.latency_queue = self.context.Queue(maxsize=1000)
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.restarts: Dict[int, int] = {}
+        self.restart_at: Dict[int, float] = {}
+        self.latencies: Dict[int, float] = {}  # {shard_id: latency}
+        self.running = True
+
+    def start_worker(self, worker_id: int):
+        shard_ids = self.shard_ranges[worker_id]
+        process = self.context.Process(
+            target=run_worker,
+            args=(worker_id, shard_ids, self.shard_count, self.latency_queue),
+            name=f"worker-{worker_id}"
+        )
+        process.start()
+        self.processes[worker_id] = process
+        self.started_at[worker_id] = time.time()
+        logger.info(f"Started worker {worker_id} (pid {process.pid}) with shards {shard_ids}")
+
+    def check_workers(self):
+        now = time.time()
+        for worker_id, process in list(self.processes.items()):
+            if process.is_alive():
+                if now - self.started_at[worker_id] > self.stable_after:
+                    self.restarts[worker_id] = 0
+                continue
+
+            if worker_id not in self.restart_at:
+                if process.exitcode == 0:
+                    logger.info(f"Worker {worker_id} exited cleanly, not restarting")
+                    del self.processes[worker_id]
+                    continue
+
+                attempts = self.restarts.get(worker_id, 0)
+                backoff = min(self.max_backoff, 2 ** attempts)
+                self.restarts[worker_id] = attempts + 1
+                self.restart_at[worker_id] = now + backoff
+                logger.error(f"Worker {worker_id} crashed (exit code {process.exitcode}), restarting in {backoff}s")
+                for shard_id in self.shard_ranges[worker_id]:
+                    self.latencies.pop(shard_id, None)
+
+            if now >= self.restart_at[worker_id]:
+                del self.restart_at[worker_id]
+                self.start_worker(worker_id)
+
+    def collect_latencies(self):
+        while True:
+            try:
+                _, _, latencies = self.latency_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.latencies.update(latencies)
+
+    def log_latencies(self):
+        if not self.latencies:
+            return
+        values = [latency for latency in self.latencies.values() if latency == latency]  # skip NaN (not connected)
+        shards = ", ".join(f"{shard_id}: {latency * 1000:.0f}ms" for shard_id, latency in sorted(self.latencies.items()))
+        if values:
+            logger.info(f"Shard latency avg {sum(values) / len(values) * 1000:.0f}ms, max {max(values) * 1000:.0f}ms ({shards})")
+
+    def stop(self, *_):
+        self.running = False
+
+    def run(self, log_interval: float = 60):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        for worker_id in range(len(self.shard_ranges)):
+            self.start_worker(worker_id)
+
+        last_log = time.time()
+        while self.running and self.processes:
+            self.check_workers()
+            self.collect_latencies()
+            if time.time() - last_log >= log_interval:
+                self.log_latencies()
+                last_log = time.time()
+            time.sleep(1)
+
+        logger.info("Stopping workers...")
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=30)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot across multiple shards and worker processes")
+    parser.add_argument("--shards", type=int, required=True, help="Total number of shards")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    args = parser.parse_args()
+
+    setup_logging()
+    Supervisor(args.shards, args.workers).run()
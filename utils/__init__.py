@@ -1,19 +1,33 @@
-from .commands import universal_command, UniversalGroup, cb
-from .container_helper import base_container, base_view, Paginator, get_color
+from .commands import universal_command, UniversalGroup, cb, command_signatures, sync_command_tree
+from .container_helper import base_container, base_view, Paginator, get_color, get_player_snapshot, invalidate_player_snapshot
 from .files import (
     read_json,
     insert_data, 
+    insert_many,
     update_data, 
     add_data,
     get_user_data, 
     get_all_data, 
     delete_user_data, 
-    user_exists
+    user_exists,
+    checkpoint_db,
+    add_write_listener,
+    claim_flag
 )
 from .formulas import calculate_level_from_xp, calculate_xp_for_level
 from .upgrades import full_multipliers, full_chances
-from .moderation import Captcha, BanManager, moderate
-from .logging import setup_logging, get_logger, handle_errors
+from .moderation import Captcha, BanManager, BanIndex, ban_index, moderate, precheck
+from .logging import setup_logging, stop_logging, get_logger, get_dropped_log_count, handle_errors
+from .webhooks import WebhookDispatcher, webhook_dispatcher
+from .reloader import CogReloader
+from .metrics import metrics, start_metrics_server
+from .monitor import LoopMonitor, install_event_loop
+from .gateway import GATEWAY_PROFILES, gateway_options
+from .cooldowns import CooldownManager, cooldowns, cooldown
+from .responses import AutoDeferResponse, auto_defer
+from .leaderboard import LEADERBOARD_SIZE, Board, Leaderboards, leaderboards
+from .help_pages import HelpPages, help_pages
+from .router import RoutedItem, ScreenView, route, routed_button, routed_id, routed_select, setup_router
 
 __version__ = "0.0.2"
 def get_version():
@@ -22,17 +36,37 @@ def get_version():
 __all__ = [
     "get_version",
 
-    "universal_command", "UniversalGroup", "get_registered_commands", "cb",
+    "universal_command", "UniversalGroup", "get_registered_commands", "cb", "command_signatures", "sync_command_tree",
 
-    "base_container", "base_view", "Paginator", "get_color",
+    "base_container", "base_view", "Paginator", "get_color", "get_player_snapshot", "invalidate_player_snapshot",
 
-    "read_json", "insert_data", "update_data", "add_data", "get_user_data", "get_all_data", "delete_user_data", "user_exists",
+    "read_json", "insert_data", "insert_many", "update_data", "add_data", "get_user_data", "get_all_data", "delete_user_data", "user_exists", "checkpoint_db", "add_write_listener", "claim_flag",
 
     "calculate_level_from_xp", "calculate_xp_for_level",
 
     "full_multipliers", "full_chances",
 
-    "Captcha", "BanManager", "moderate",
+    "Captcha", "BanManager", "BanIndex", "ban_index", "moderate", "precheck",
     
-    "setup_logging", "get_logger", "handle_errors"
+    "setup_logging", "stop_logging", "get_logger", "get_dropped_log_count", "handle_errors",
+
+    "WebhookDispatcher", "webhook_dispatcher",
+
+    "CogReloader",
+
+    "metrics", "start_metrics_server",
+
+    "LoopMonitor", "install_event_loop",
+
+    "CooldownManager", "cooldowns", "cooldown",
+
+    "GATEWAY_PROFILES", "gateway_options",
+
+    "AutoDeferResponse", "auto_defer",
+
+    "LEADERBOARD_SIZE", "Board", "Leaderboards", "leaderboards",
+
+    "HelpPages", "help_pages",
+
+    "RoutedItem", "ScreenView", "route", "routed_button", "routed_id", "routed_select", "setup_router"
 ]
\ No newline at end of file
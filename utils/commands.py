@@ -1,9 +1,31 @@
+import functools
+import hashlib
+import json
+import os
+
+import aiofiles
 import discord
 from discord import app_commands
 
+from .logging import get_logger
+from .metrics import track_command
+from .responses import auto_defer
+
+logger = get_logger(__name__)
+
+COMMAND_FINGERPRINT_PATH = "data/command_tree.sha256"
+
 def universal_command(name: str, description: str):
     def decorator(func):
-        command = app_commands.command(name=name, description=description)(func)
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            interaction = next((arg for arg in args if isinstance(arg, discord.Interaction)), None)
+            if interaction is None:
+                return await track_command(name, func, *args, **kwargs)
+            async with auto_defer(interaction):
+                return await track_command(name, func, *args, **kwargs)
+
+        command = app_commands.command(name=name, description=description)(wrapper)
         
         command.allowed_contexts = app_commands.AppCommandContext(guild=True, dm_channel=True, private_channel=True)
         command.allowed_installs = app_commands.AppInstallationType(guild=True, user=True)
@@ -25,6 +47,65 @@ async def cb(interaction: discord.Interaction, view = discord.ui.LayoutView, is_
             await interaction.response.send_message(view=view)
     else:
         if interaction.response.is_done():
-            await interaction.followup.edit_message(view=view)
+            await interaction.edit_original_response(view=view)
         else:
-            await interaction.response.edit_message(view=view)
\ No newline at end of file
+            await interaction.response.edit_message(view=view)
+
+def command_signatures(bot, module: str = None) -> str:
+    """
+    Hash the serialized app command payloads registered on the bot's tree.
+
+    Args:
+        bot: The bot instance
+        module: Only include commands from cogs defined in this module (e.g. "cogs.core")
+
+    Returns:
+        Hex digest that only changes when what Discord sees would change
+    """
+    payloads = []
+    for cog in bot.cogs.values():
+        if module is not None and type(cog).__module__ != module:
+            continue
+        for command in cog.get_app_commands():
+            payloads.append(command.to_dict(bot.tree))
+
+    if module is None:
+        # Commands added directly to the tree, outside any cog
+        cog_commands = {id(command) for cog in bot.cogs.values() for command in cog.get_app_commands()}
+        for command in bot.tree.get_commands():
+            if id(command) not in cog_commands:
+                payloads.append(command.to_dict(bot.tree))
+
+    payloads.sort(key=lambda payload: (payload.get("type", 1), payload["name"]))
+    return hashlib.sha256(json.dumps(payloads, sort_keys=True).encode()).hexdigest()
+
+
+async def sync_command_tree(bot, force: bool = False) -> bool:
+    """
+    Sync the command tree with Discord only if it changed since the last sync.
+    The fingerprint of the last synced tree is stored in COMMAND_FINGERPRINT_PATH.
+
+    Args:
+        bot: The bot instance
+        force: Sync even if the fingerprint is unchanged
+
+    Returns:
+        True if a sync was performed
+    """
+    fingerprint = command_signatures(bot)
+
+    stored = None
+    if os.path.exists(COMMAND_FINGERPRINT_PATH):
+        async with aiofiles.open(COMMAND_FINGERPRINT_PATH, mode="r") as f:
+            stored = (await f.read()).strip()
+
+    if not force and stored == fingerprint:
+        logger.info(f"Command tree unchanged ({fingerprint[:12]}), skipping sync")
+        return False
+
+    await bot.tree.sync()
+    os.makedirs(os.path.dirname(COMMAND_FINGERPRINT_PATH), exist_ok=True)
+    async with aiofiles.open(COMMAND_FINGERPRINT_PATH, mode="w") as f:
+        await f.write(fingerprint)
+    logger.info(f"Command tree synced ({(stored or 'none')[:12]} -> {fingerprint[:12]})")
+    return True
@@ -1,22 +1,85 @@
+import asyncio
+import time
+from collections import OrderedDict
+
 import discord
 
-from typing import Tuple, List, Optional
-from .files import get_user_data, user_exists, insert_data
+from typing import Awaitable, Callable, Dict, Tuple, List, Optional
+from .files import claim_flag, get_user_data, user_exists, insert_data
+from .metrics import metrics
+from .router import ScreenView, routed_button
+
+# Player snapshots: what every screen's shell needs (accent color, onboarding state), cached so
+# rendering a screen, pressing a button or flipping a page doesn't start with database reads
+PLAYER_SNAPSHOT_TTL = 300  # picks up colors edited directly in the database
+PLAYER_SNAPSHOT_LIMIT = 10_000
+_player_snapshots: "OrderedDict[int, Tuple[float, dict]]" = OrderedDict()  # {user_id: (loaded_at, snapshot)}
+
+async def get_player_snapshot(user_id: int) -> dict:
+    """
+    Get the cached shell data for a player, loading it from their profile on a miss.
+
+    Returns:
+        {"color": int | None, "onboarded": bool}
+    """
+    cached = _player_snapshots.get(user_id)
+    if cached and time.time() - cached[0] < PLAYER_SNAPSHOT_TTL:
+        _player_snapshots.move_to_end(user_id)
+        metrics.cache_hit("player_snapshot")
+        return cached[1]
+    metrics.cache_miss("player_snapshot")
+
+    profile_data = await get_user_data("profile", user_id) or {}
+    onboarded = bool(profile_data.get("onboarded"))
+    if not onboarded and await user_exists("currency", user_id):
+        # Played before the onboarding flag existed, record it so this check only happens once
+        await insert_data("profile", {"id": user_id, "onboarded": 1})
+        onboarded = True
+
+    snapshot = {"color": profile_data.get("color", None), "onboarded": onboarded}
+    _player_snapshots[user_id] = (time.time(), snapshot)
+    _player_snapshots.move_to_end(user_id)
+    while len(_player_snapshots) > PLAYER_SNAPSHOT_LIMIT:
+        _player_snapshots.popitem(last=False)
+    return snapshot
 
-async def base_container(interaction: discord.Interaction) -> discord.ui.Container:
+def invalidate_player_snapshot(user_id: int) -> None:
+    """Drop a cached snapshot, call after changing a player's color or onboarding state"""
+    _player_snapshots.pop(user_id, None)
+
+async def claim_onboarding(user_id: int, snapshot: Optional[dict] = None) -> bool:
+    """Returns True exactly once per player, the first time they see a screen"""
+    snapshot = snapshot or await get_player_snapshot(user_id)
+    if snapshot["onboarded"]:
+        return False
+    snapshot["onboarded"] = True
+    # Screens opened at the same moment (or on other workers) race to here, only one sets the flag
+    return await claim_flag("profile", user_id, "onboarded")
+
+async def base_container(interaction: discord.Interaction, snapshot: Optional[dict] = None) -> discord.ui.Container:
     container = discord.ui.Container()
     container.add_item(discord.ui.TextDisplay(f"-# {interaction.user.name}"))
     container.add_item(discord.ui.Separator())
 
-    color = await get_color(interaction)
-    container.accent_color = color
+    if snapshot is None:
+        snapshot = await get_player_snapshot(interaction.user.id)
+    container.accent_color = snapshot["color"]
     return container
 
-async def base_view(interaction: discord.Interaction) -> Tuple[discord.ui.LayoutView, discord.ui.Container]:
-    view = discord.ui.LayoutView(timeout=None)
-    container = await base_container(interaction)
-    if not await user_exists("currency", interaction.user.id):
-        await insert_data("profile", {"id": interaction.user.id})
+async def base_view(interaction: discord.Interaction, snapshot: Optional[dict] = None) -> Tuple[discord.ui.LayoutView, discord.ui.Container]:
+    """
+    The shell every screen is built in: a view holding a container with the player's name and
+    accent color, plus the welcome message the first time they see a screen.
+
+    Args:
+        interaction: The interaction being answered
+        snapshot: The player's snapshot if the caller already has it, fetched otherwise
+    """
+    view = ScreenView()
+    if snapshot is None:
+        snapshot = await get_player_snapshot(interaction.user.id)
+    container = await base_container(interaction, snapshot)
+    if await claim_onboarding(interaction.user.id, snapshot):
         container.add_item(discord.ui.TextDisplay(
             f"Welcome {interaction.user.mention}!\n"
             f"Use </gain:1411612232399327293> to start.\n"
@@ -31,16 +94,76 @@ async def base_view(interaction: discord.Interaction) -> Tuple[discord.ui.Layout
     return view, container
 
 class Paginator:
-    def __init__(self, interaction: discord.Interaction, items: List[discord.ui.Container], per_page: int, header_container: discord.ui.Container = None, footer_components: List[discord.ui.ActionRow] = None):
+    """
+    Pages through containers, either a prebuilt list or built lazily a page at a time.
+
+    Args:
+        interaction: The interaction to respond to
+        items: Prebuilt containers. Leave as None and pass item_count and page_factory instead to
+            only build the pages that are actually shown
+        per_page: Items per page
+        header_container: Shown above the items on every page
+        footer_components: Shown below the items on every page
+        item_count: Total number of items, for lazy pages
+        page_factory: async (start, end) -> List[Container] building the items in [start, end)
+        prefetch: Build the pages next to the current one in the background, so flipping is instant
+        page_route: Route the Previous/Next buttons through this action with the page number as its
+            argument, instead of keeping this paginator in memory. The handler rebuilds the screen on that page
+        page_route_args: Extra route arguments, passed before the page number
+    """
+
+    def __init__(self, interaction: discord.Interaction, items: Optional[List[discord.ui.Container]] = None, per_page: int = 5, header_container: discord.ui.Container = None, footer_components: List[discord.ui.ActionRow] = None, *, item_count: Optional[int] = None, page_factory: Optional[Callable[[int, int], Awaitable[List[discord.ui.Container]]]] = None, prefetch: bool = False, page_route: Optional[str] = None, page_route_args: Tuple = ()):
+        if items is None and (item_count is None or page_factory is None):
+            raise ValueError("Paginator needs either items or item_count and page_factory")
+
         self.interaction = interaction
         self.items = items
+        self.item_count = len(items) if items is not None else item_count
+        self.page_factory = page_factory
+        self.prefetch = prefetch
+        self.page_route = page_route
+        self.page_route_args = page_route_args
         self.per_page = per_page
         self.current_page = 0
         self.header_container = header_container
         self.footer_components = footer_components or []
+        self._pages: Dict[int, asyncio.Task] = {}  # {page: task building it}, lazy mode only
+
+    @property
+    def total_pages(self) -> int:
+        return max(1, (self.item_count - 1) // self.per_page + 1)
+
+    def _page_task(self, page: int) -> asyncio.Task:
+        task = self._pages.get(page)
+        if task is None:
+            start = page * self.per_page
+            end = min(start + self.per_page, self.item_count)
+            task = self._pages[page] = asyncio.create_task(self.page_factory(start, end))
+        return task
+
+    async def get_page_items(self, page: int) -> List[discord.ui.Container]:
+        if self.items is not None:
+            start = page * self.per_page
+            return self.items[start:start + self.per_page]
+
+        task = self._page_task(page)
+        try:
+            return await task
+        except Exception:
+            self._pages.pop(page, None)  # let the next attempt rebuild it
+            raise
+
+    def _prefetch_adjacent(self) -> None:
+        if self.items is not None or not self.prefetch:
+            return
+        for page in (self.current_page - 1, self.current_page + 1):
+            if 0 <= page < self.total_pages:
+                task = self._page_task(page)
+                # A failed prefetch is retried when the page is opened, don't log it as unhandled
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
     async def get_view(self) -> discord.ui.LayoutView:
-        view = discord.ui.LayoutView(timeout=None)
+        view = ScreenView()
         
         main_container = await base_container(self.interaction)
         
@@ -49,9 +172,7 @@ class Paginator:
                 main_container.add_item(component)
             main_container.add_item(discord.ui.Separator())
         
-        start = self.current_page * self.per_page
-        end = start + self.per_page
-        current_items = self.items[start:end]
+        current_items = await self.get_page_items(self.current_page)
         
         for i, item in enumerate(current_items):
             for component in item.children:
@@ -60,31 +181,35 @@ class Paginator:
             if i < len(current_items) - 1:
                 main_container.add_item(discord.ui.Separator())
         
-        if len(self.items) > self.per_page:
+        if self.item_count > self.per_page:
             main_container.add_item(discord.ui.Separator())
             action_row = discord.ui.ActionRow()
             
-            prev_button = discord.ui.Button(
-                label="Previous", 
-                disabled=not self.has_previous_page(),
-                style=discord.ButtonStyle.secondary
-            )
-            prev_button.callback = self._previous_callback
+            if self.page_route:
+                user_id = self.interaction.user.id
+                prev_button = routed_button(self.page_route, *self.page_route_args, self.current_page - 1, user_id=user_id, label="Previous", disabled=not self.has_previous_page())
+                next_button = routed_button(self.page_route, *self.page_route_args, self.current_page + 1, user_id=user_id, label="Next", disabled=not self.has_next_page())
+            else:
+                prev_button = discord.ui.Button(
+                    label="Previous", 
+                    disabled=not self.has_previous_page(),
+                    style=discord.ButtonStyle.secondary
+                )
+                prev_button.callback = self._previous_callback
+
+                next_button = discord.ui.Button(
+                    label="Next", 
+                    disabled=not self.has_next_page(),
+                    style=discord.ButtonStyle.secondary
+                )
+                next_button.callback = self._next_callback
             
-            total_pages = (len(self.items) - 1) // self.per_page + 1
             page_info = discord.ui.Button(
-                label=f"{self.current_page + 1}/{total_pages}",
+                label=f"{self.current_page + 1}/{self.total_pages}",
                 disabled=True,
                 style=discord.ButtonStyle.secondary
             )
             
-            next_button = discord.ui.Button(
-                label="Next", 
-                disabled=not self.has_next_page(),
-                style=discord.ButtonStyle.secondary
-            )
-            next_button.callback = self._next_callback
-            
             action_row.add_item(prev_button)
             action_row.add_item(page_info)
             action_row.add_item(next_button)
@@ -96,10 +221,11 @@ class Paginator:
                 main_container.add_item(footer_component)
         
         view.add_item(main_container)
+        self._prefetch_adjacent()
         return view
 
     def has_next_page(self) -> bool:
-        return (self.current_page + 1) * self.per_page < len(self.items)
+        return (self.current_page + 1) * self.per_page < self.item_count
 
     def has_previous_page(self) -> bool:
         return self.current_page > 0
@@ -126,15 +252,10 @@ class Paginator:
                 await self.interaction.response.send_message(view=view)
         else:
             if self.interaction.response.is_done():
-                await self.interaction.followup.edit_message(view=view)
+                await self.interaction.edit_original_response(view=view)
             else:
                 await self.interaction.response.edit_message(view=view)
 
 async def get_color(interaction: discord.Interaction) -> Optional[discord.Color]:
-    user_id = interaction.user.id
-    profile_data = await get_user_data("profile", user_id)
-    
-    if profile_data:
-        return profile_data.get("color", None)
-    else:
-        return None
\ No newline at end of file
+    snapshot = await get_player_snapshot(interaction.user.id)
+    return snapshot["color"]
\ No newline at end of file
@@ -0,0 +1,198 @@
+# Per-user, per-command cooldowns kept in memory as token buckets.
+# Checks never touch the database, buckets that are still refilling are
+# written out periodically so a restart doesn't reset everyone's cooldowns.
+# Cluster workers each keep their own buckets and share the table: a write only
+# replaces a row if it is the emptier of the two, and each save pulls in emptier
+# rows written by other workers, so workers agree within one save interval.
+
+import asyncio
+import functools
+import time
+from typing import Dict, Tuple
+
+import aiosqlite
+import discord
+
+from .files import connect_db
+from .logging import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+class CooldownManager:
+    # Table: cooldowns
+    # user_id | name | tokens | updated_at | rate | per
+    # 123 | "gain" | 0.0 | 1700000000.0 | 1 | 2.0
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, int], list] = {}  # {(name, user_id): [tokens, updated_at, rate, per]}
+        self._dirty = set()
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _refill(bucket: list, now: float) -> None:
+        tokens, updated_at, rate, per = bucket
+        bucket[0] = min(rate, tokens + (now - updated_at) * rate / per)
+        bucket[1] = now
+
+    def consume(self, name: str, user_id: int, per: float, rate: int = 1) -> float:
+        """
+        Take a token from the user's bucket for this command.
+
+        Args:
+            name: Cooldown name, commands sharing a name share a bucket
+            user_id: The user's ID
+            per: Seconds it takes to refill the bucket
+            rate: Uses allowed per `per` seconds
+
+        Returns:
+            0 if the use is allowed, otherwise seconds until it will be
+        """
+        now = time.time()
+        key = (name, user_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(rate), now, rate, per]
+        else:
+            bucket[2], bucket[3] = rate, per
+            self._refill(bucket, now)
+
+        self._dirty.add(key)
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) * per / rate
+
+    def reset(self, name: str, user_id: int) -> None:
+        if self._buckets.pop((name, user_id), None) is not None:
+            self._dirty.add((name, user_id))
+
+    @staticmethod
+    async def _ensure_schema(db: aiosqlite.Connection) -> None:
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS cooldowns (
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                rate INTEGER NOT NULL,
+                per REAL NOT NULL,
+                PRIMARY KEY (user_id, name)
+            )
+        ''')
+
+    async def load(self) -> None:
+        """Restore buckets that were still refilling when they were last saved"""
+        async with connect_db() as db:
+            await self._ensure_schema(db)
+            await db.commit()
+            async with db.execute("SELECT user_id, name, tokens, updated_at, rate, per FROM cooldowns") as cursor:
+                rows = await cursor.fetchall()
+
+        now = time.time()
+        for user_id, name, tokens, updated_at, rate, per in rows:
+            bucket = [tokens, updated_at, rate, per]
+            self._refill(bucket, now)
+            if bucket[0] < rate:
+                self._buckets.setdefault((name, user_id), bucket)
+
+    async def persist(self) -> None:
+        """Save buckets changed since the last call. Full buckets are dropped from memory and the table"""
+        async with self._lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+
+            now = time.time()
+            upserts, deletes = [], []
+            for key in dirty:
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    self._refill(bucket, now)
+                    if bucket[0] < bucket[2]:
+                        upserts.append((key[1], key[0], *bucket))
+                        continue
+                    del self._buckets[key]
+                deletes.append((key[1], key[0]))
+
+            try:
+                async with connect_db() as db:
+                    await self._ensure_schema(db)
+                    # The stored row, refilled up to our write, against ours: keep the emptier one
+                    await db.executemany('''
+                        INSERT INTO cooldowns (user_id, name, tokens, updated_at, rate, per) VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(user_id, name) DO UPDATE SET
+                            tokens = excluded.tokens, updated_at = excluded.updated_at, rate = excluded.rate, per = excluded.per
+                        WHERE excluded.tokens <= MIN(cooldowns.rate, cooldowns.tokens + (excluded.updated_at - cooldowns.updated_at) * cooldowns.rate / cooldowns.per)
+                    ''', upserts)
+                    # Our bucket refilled, but another worker's may not have
+                    await db.executemany(
+                        "DELETE FROM cooldowns WHERE user_id = ? AND name = ? AND tokens + (? - updated_at) * rate / per >= rate",
+                        [(*key, now) for key in deletes]
+                    )
+                    await db.commit()
+                    stored = await self._read_rows(db, list({user_id for user_id, *_ in upserts}))
+            except Exception:
+                # Try again next time
+                self._dirty |= dirty
+                raise
+
+            # Take on rows that other workers left emptier than ours
+            for user_id, name, tokens, updated_at, rate, per in stored:
+                bucket = self._buckets.get((name, user_id))
+                if bucket is None:
+                    continue
+                theirs = [tokens, updated_at, rate, per]
+                self._refill(theirs, max(now, bucket[1]))  # consume() may have run since
+                if theirs[0] < bucket[0]:
+                    bucket[0] = theirs[0]
+
+    @staticmethod
+    async def _read_rows(db: aiosqlite.Connection, user_ids: list) -> list:
+        rows = []
+        for start in range(0, len(user_ids), 500):  # stay under SQLite's variable limit
+            chunk = user_ids[start:start + 500]
+            async with db.execute(
+                f"SELECT user_id, name, tokens, updated_at, rate, per FROM cooldowns WHERE user_id IN ({', '.join('?' for _ in chunk)})", chunk
+            ) as cursor:
+                rows.extend(await cursor.fetchall())
+        return rows
+
+    async def run_persistence(self, interval: float = 30):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.persist()
+            except Exception as e:
+                logger.error(f"Error saving cooldowns: {e}")
+
+cooldowns = CooldownManager()
+
+def cooldown(per: float, rate: int = 1, name: str = None):
+    """
+    Limit how often a user can run a command. Goes between @universal_command and @handle_errors
+
+    Args:
+        per: Seconds it takes to refill the bucket
+        rate: Uses allowed per `per` seconds
+        name: Bucket name, defaults to the function name
+    """
+    def decorator(func):
+        bucket_name = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            interaction = next((arg for arg in args if isinstance(arg, discord.Interaction)), None)
+            if interaction is None:
+                return await func(*args, **kwargs)
+
+            retry_after = cooldowns.consume(bucket_name, interaction.user.id, per, rate)
+            if retry_after:
+                metrics.increment("cooldown_rejections")
+                return await interaction.response.send_message(
+                    f"This command is on cooldown. Try again in {retry_after:.1f} seconds.", ephemeral=True
+                )
+            return await func(*args, **kwargs)
+
+        return wrapper
+    return decorator
@@ -1,7 +1,10 @@
 import json
+import sqlite3
 import aiofiles
 import aiosqlite
-from typing import Dict, Any, List, Optional, Union
+from typing import Callable, Dict, Any, List, Optional, Union
+
+from .metrics import track_db
 
 async def read_json(file_path: str) -> Optional[Dict[str, Any]]:
     try:
@@ -13,8 +16,40 @@ async def read_json(file_path: str) -> Optional[Dict[str, Any]]:
         return None
 
 DB_PATH = f"data/database.db"
+DB_TIMEOUT = 30.0  # seconds to wait on a lock held by another connection/process
+
+_wal_enabled = False
+
+_write_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+
+def add_write_listener(listener: Callable[[str, Dict[str, Any]], None]) -> None:
+    """
+    Call listener(table, data) after every committed insert_data/insert_many row and every
+    update_data by id. data holds the id and the columns written, as passed in (not JSON encoded).
+    Listeners run inline with the write, so they must be quick and must not raise.
+    """
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+def _notify_write(table: str, data: Dict[str, Any]) -> None:
+    for listener in _write_listeners:
+        listener(table, data)
+
+def connect_db() -> aiosqlite.Connection:
+    """
+    Open a connection to the bot database.
+    Several worker processes can share the database, so writers wait on locks instead of failing.
+    """
+    return aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT)
 
 async def _ensure_table_exists(db: aiosqlite.Connection, table: str, columns: Dict[str, Any] = None):
+    global _wal_enabled
+    if not _wal_enabled:
+        # WAL lets readers in other processes keep going while one process writes.
+        # It is persistent, so this only needs to run once per process.
+        await db.execute("PRAGMA journal_mode=WAL")
+        _wal_enabled = True
+
     await db.execute(f'''
         CREATE TABLE IF NOT EXISTS {table} (
             id INTEGER PRIMARY KEY
@@ -38,10 +73,21 @@ async def _ensure_table_exists(db: aiosqlite.Connection, table: str, columns: Di
                 else:
                     col_type = "TEXT DEFAULT ''"
                 
-                await db.execute(f'''
-                    ALTER TABLE {table} ADD COLUMN {col_name} {col_type}
-                ''')
+                try:
+                    await db.execute(f'''
+                        ALTER TABLE {table} ADD COLUMN {col_name} {col_type}
+                    ''')
+                except sqlite3.OperationalError as e:
+                    # Another connection added it since we looked
+                    if "duplicate column name" not in str(e):
+                        raise
 
+async def checkpoint_db() -> None:
+    """Fold the WAL back into the main database file, run on shutdown"""
+    async with connect_db() as db:
+        await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+@track_db
 async def insert_data(table: str, data: Dict[str, Any]) -> int:
     """
     Insert or update data in a table (upsert).
@@ -64,31 +110,71 @@ async def insert_data(table: str, data: Dict[str, Any]) -> int:
         else:
             processed_data[key] = value
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_db() as db:
         await _ensure_table_exists(db, table, processed_data)
+        await _upsert(db, table, processed_data)
+        await db.commit()
+    _notify_write(table, data)
+    return processed_data["id"]
+
+async def _upsert(db: aiosqlite.Connection, table: str, processed_data: Dict[str, Any]) -> None:
+    # One statement, so concurrent first writes for the same id can't both take the insert path
+    columns = ", ".join(processed_data.keys())
+    placeholders = ", ".join(["?" for _ in processed_data.values()])
+    update_columns = [col for col in processed_data.keys() if col != "id"]
+    if update_columns:
+        conflict_clause = "DO UPDATE SET " + ", ".join([f"{col} = excluded.{col}" for col in update_columns])
+    else:
+        conflict_clause = "DO NOTHING"
+    
+    await db.execute(f'''
+        INSERT INTO {table} ({columns}) VALUES ({placeholders})
+        ON CONFLICT(id) {conflict_clause}
+    ''', list(processed_data.values()))
+
+@track_db
+async def insert_many(table: str, rows: List[Dict[str, Any]]) -> None:
+    """
+    Insert or update many rows in a table (upsert) using a single connection and transaction.
+    All rows should have the same columns.
+    
+    Args:
+        table: Table name
+        rows: List of dictionaries of column_name: value (each must include "id")
+    """
+    if not rows:
+        return
+    
+    processed_rows = []
+    for data in rows:
+        if "id" not in data:
+            raise ValueError("Data must include an 'id' field")
+        processed_rows.append({
+            key: json.dumps(value) if isinstance(value, (list, dict)) else value
+            for key, value in data.items()
+        })
+    
+    column_names = list(processed_rows[0].keys())
+    columns = ", ".join(column_names)
+    placeholders = ", ".join(["?" for _ in column_names])
+    update_columns = [col for col in column_names if col != "id"]
+    if update_columns:
+        conflict_clause = "DO UPDATE SET " + ", ".join([f"{col} = excluded.{col}" for col in update_columns])
+    else:
+        conflict_clause = "DO NOTHING"
+    
+    async with connect_db() as db:
+        await _ensure_table_exists(db, table, processed_rows[0])
         
-        cursor = await db.execute(f'SELECT id FROM {table} WHERE id = ?', (processed_data["id"],))
-        exists = await cursor.fetchone()
-        
-        if exists:
-            update_data_dict = {k: v for k, v in processed_data.items() if k != "id"}
-            if update_data_dict: 
-                set_clause = ", ".join([f"{col} = ?" for col in update_data_dict.keys()])
-                await db.execute(f'''
-                    UPDATE {table} SET {set_clause} WHERE id = ?
-                ''', list(update_data_dict.values()) + [processed_data["id"]])
-            await db.commit()
-            return processed_data["id"]
-        else:
-            columns = ", ".join(processed_data.keys())
-            placeholders = ", ".join(["?" for _ in processed_data.values()])
-            
-            cursor = await db.execute(f'''
-                INSERT INTO {table} ({columns}) VALUES ({placeholders})
-            ''', list(processed_data.values()))
-            await db.commit()
-            return cursor.lastrowid
+        await db.executemany(f'''
+            INSERT INTO {table} ({columns}) VALUES ({placeholders})
+            ON CONFLICT(id) {conflict_clause}
+        ''', [[row.get(col) for col in column_names] for row in processed_rows])
+        await db.commit()
+    for data in rows:
+        _notify_write(table, data)
 
+@track_db
 async def update_data(table: str, data: Dict[str, Any], where_column: str, where_value: Any):
     """
     Update data in a table.
@@ -99,7 +185,7 @@ async def update_data(table: str, data: Dict[str, Any], where_column: str, where
         where_column: Column name for WHERE clause
         where_value: Value for WHERE clause
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_db() as db:
         await _ensure_table_exists(db, table, data)
         
         set_clause = ", ".join([f"{col} = ?" for col in data.keys()])
@@ -108,7 +194,10 @@ async def update_data(table: str, data: Dict[str, Any], where_column: str, where
             UPDATE {table} SET {set_clause} WHERE {where_column} = ?
         ''', list(data.values()) + [where_value])
         await db.commit()
+    if where_column == "id":
+        _notify_write(table, {**data, "id": where_value})
 
+@track_db
 async def get_user_data(table: str, user_id: int, default: Any = None) -> Union[Dict[str, Any], Any]:
     """
     Get a single user's data from a table.
@@ -121,24 +210,28 @@ async def get_user_data(table: str, user_id: int, default: Any = None) -> Union[
     Returns:
         Dictionary with column names as keys and values, or default if not found
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_db() as db:
         await _ensure_table_exists(db, table)
         
         async with db.execute(f'SELECT * FROM {table} WHERE id = ?', (user_id,)) as cursor:
             row = await cursor.fetchone()
             if row:
-                column_names = [description[0] for description in cursor.description]
-                result = dict(zip(column_names, row))
-                for key, value in result.items():
-                    if isinstance(value, str):
-                        try:
-                            result[key] = json.loads(value)
-                        except json.JSONDecodeError:
-                            pass
-                return result
+                return _decode_row(cursor, row)
             return default
     return default # it should never reach here
 
+def _decode_row(cursor: aiosqlite.Cursor, row: tuple) -> Dict[str, Any]:
+    column_names = [description[0] for description in cursor.description]
+    result = dict(zip(column_names, row))
+    for key, value in result.items():
+        if isinstance(value, str):
+            try:
+                result[key] = json.loads(value)
+            except json.JSONDecodeError:
+                pass
+    return result
+
+@track_db
 async def get_all_data(table: str) -> List[Dict[str, Any]]:
     """
     Get all data from a table.
@@ -149,7 +242,7 @@ async def get_all_data(table: str) -> List[Dict[str, Any]]:
     Returns:
         List of dictionaries, each with column names as keys
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_db() as db:
         await _ensure_table_exists(db, table)
         
         async with db.execute(f'SELECT * FROM {table}') as cursor:
@@ -159,6 +252,7 @@ async def get_all_data(table: str) -> List[Dict[str, Any]]:
                 return [dict(zip(column_names, row)) for row in rows]
             return []
 
+@track_db
 async def delete_user_data(table: str, user_id: int):
     """
     Delete a user's data from a table.
@@ -167,12 +261,13 @@ async def delete_user_data(table: str, user_id: int):
         table: Table name
         user_id: Discord user ID
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_db() as db:
         await _ensure_table_exists(db, table)
         
         await db.execute(f'DELETE FROM {table} WHERE id = ?', (user_id,))
         await db.commit()
 
+@track_db
 async def user_exists(table: str, user_id: int) -> bool:
     """
     Check if a user exists in a table.
@@ -184,13 +279,37 @@ async def user_exists(table: str, user_id: int) -> bool:
     Returns:
         True if user exists, False otherwise
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_db() as db:
         await _ensure_table_exists(db, table)
         
         async with db.execute(f'SELECT 1 FROM {table} WHERE id = ? LIMIT 1', (user_id,)) as cursor:
             row = await cursor.fetchone()
             return row is not None
 
+@track_db
+async def claim_flag(table: str, user_id: int, column: str) -> bool:
+    """
+    Set a one-time 0/1 flag for a user, creating their row if needed, in a single statement.
+    
+    Args:
+        table: Table name
+        user_id: Discord user ID
+        column: Flag column
+        
+    Returns:
+        True if this call set the flag, False if it was already set (even by another process)
+    """
+    async with connect_db() as db:
+        await _ensure_table_exists(db, table, {column: 0})
+        
+        cursor = await db.execute(f'''
+            INSERT INTO {table} (id, {column}) VALUES (?, 1)
+            ON CONFLICT(id) DO UPDATE SET {column} = 1 WHERE COALESCE({column}, 0) = 0
+        ''', (user_id,))
+        await db.commit()
+        return cursor.rowcount > 0
+
+@track_db
 async def add_data(table: str, user_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Add values to existing columns for a user. Creates user with 0 values if they don't exist.
@@ -204,15 +323,15 @@ async def add_data(table: str, user_id: int, data: Dict[str, Any]) -> Dict[str,
     Returns:
         Dictionary with the updated values
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_db() as db:
         await _ensure_table_exists(db, table, data)
         
-        current_data = await get_user_data(table, user_id)
-        if current_data is None:
-            current_data = {"id": user_id}
-            for col_name in data.keys():
-                current_data[col_name] = 0
-            await insert_data(table, current_data)
+        # Hold the write lock from the read to the write, otherwise concurrent adds (from this
+        # process or another worker) read the same value and one of the additions is lost
+        await db.execute("BEGIN IMMEDIATE")
+        async with db.execute(f'SELECT * FROM {table} WHERE id = ?', (user_id,)) as cursor:
+            row = await cursor.fetchone()
+            current_data = _decode_row(cursor, row) if row else {"id": user_id}
         
         updated_data = {"id": user_id}
         for col_name, add_amount in data.items():
@@ -224,6 +343,10 @@ async def add_data(table: str, user_id: int, data: Dict[str, Any]) -> Dict[str,
             else:
                 updated_data[col_name] = add_amount
         
-        await insert_data(table, updated_data)
-        
-        return updated_data
\ No newline at end of file
+        await _upsert(db, table, {
+            key: json.dumps(value) if isinstance(value, (list, dict)) else value
+            for key, value in updated_data.items()
+        })
+        await db.commit()
+    _notify_write(table, updated_data)
+    return updated_data
\ No newline at end of file
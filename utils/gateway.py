@@ -0,0 +1,37 @@
+# Gateway profiles: what the bot asks Discord for and what discord.py keeps in memory.
+# Every user-facing command is a slash command, so the default profile only needs guilds.
+
+import discord
+
+GATEWAY_PROFILES = ("slash", "full")
+
+def gateway_options(profile: str = "slash") -> dict:
+    """
+    Client keyword arguments for a gateway profile.
+
+    Args:
+        profile: "slash" for slash commands only: just the guilds intent, no member or message cache
+            and no chunking. "full" for the old behaviour: default intents plus message content,
+            for prefix commands
+
+    Returns:
+        Keyword arguments for the bot constructor
+    """
+    if profile == "full":
+        intents = discord.Intents.default()
+        intents.message_content = True
+        return {"intents": intents}
+
+    if profile != "slash":
+        raise ValueError(f"Unknown gateway profile {profile!r}, expected one of {GATEWAY_PROFILES}")
+
+    # Guilds is still needed: without it discord.py has no guild or channel cache and app
+    # command checks that look at the guild break
+    intents = discord.Intents.none()
+    intents.guilds = True
+    return {
+        "intents": intents,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "max_messages": None,
+        "chunk_guilds_at_startup": False,
+    }
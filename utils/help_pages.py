@@ -0,0 +1,126 @@
+# Help content lives in data/help.json. It is read and validated once, and every page's text and
+# the stage select options are rendered up front, so showing a help page is a dict lookup plus
+# (only for stages with gated pages) one read of the player's tutorials.
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import discord
+
+from .files import get_user_data, read_json
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+HELP_PATH = "data/help.json"
+
+class HelpPage(NamedTuple):
+    key: str
+    text: str  # stage title, page title and content, ready for a TextDisplay
+    requirement: Optional[str]  # tutorial the player needs to have seen, None for everyone
+
+class HelpStage(NamedTuple):
+    name: str
+    title: str
+    pages: Tuple[HelpPage, ...]
+    gated: bool  # whether any page has a requirement
+
+class HelpPages:
+    def __init__(self, path: str = HELP_PATH):
+        self.path = path
+        self.loaded = False
+        self.main_text = ""
+        self.stages: Dict[str, HelpStage] = {}
+        self._pages: Dict[Tuple[str, str], HelpPage] = {}  # {(stage, page key): page}
+        self.main_options: Tuple[discord.SelectOption, ...] = ()  # stages, shown on the main page
+        self.stage_options: Tuple[discord.SelectOption, ...] = ()  # stages and main, shown on stage pages
+
+    async def load(self) -> None:
+        """Read, validate and render the help file. Raises ValueError if the file is malformed"""
+        data = await read_json(self.path)
+        if not isinstance(data, dict):
+            raise ValueError(f"Could not read help content from {self.path}")
+        self._build(data)
+        self.loaded = True
+        logger.info(f"Loaded {len(self._pages)} help pages in {len(self.stages)} stages")
+
+    async def ensure_loaded(self) -> None:
+        if not self.loaded:
+            await self.load()
+
+    def _build(self, data: Dict[str, Any]) -> None:
+        def require(value: Any, kind: type, where: str) -> Any:
+            if not isinstance(value, kind):
+                raise ValueError(f"{self.path}: {where} should be a {kind.__name__}")
+            return value
+
+        main = require(data.get("main"), dict, "main")
+        main_text = f"**{require(main.get('title'), str, 'main.title')}**\n\n{require(main.get('description'), str, 'main.description')}"
+
+        stages = {}
+        pages = {}
+        main_options = []
+        stage_options = []
+        for name, stage_data in data.items():
+            require(stage_data, dict, name)
+            select = require(stage_data.get("select"), dict, f"{name}.select")
+            option = discord.SelectOption(
+                label=require(select.get("label"), str, f"{name}.select.label"),
+                description=select.get("description"),
+                value=name,
+                emoji=select.get("emoji")
+            )
+            stage_options.append(option)
+            if name == "main":
+                continue
+            main_options.append(option)
+
+            title = require(stage_data.get("title"), str, f"{name}.title")
+            page_data = require(stage_data.get("pages"), dict, f"{name}.pages")
+            if not page_data:
+                raise ValueError(f"{self.path}: {name} has no pages")
+
+            stage_pages = []
+            for key, page in page_data.items():
+                where = f"{name}.pages.{key}"
+                if ":" in key:
+                    # Page keys end up in button custom_ids
+                    raise ValueError(f"{self.path}: {where} can't contain ':'")
+                require(page, dict, where)
+                requirement = page.get("requirement")
+                if requirement is not None:
+                    require(requirement, str, f"{where}.requirement")
+                text = (
+                    f"**{title}**\n\n"
+                    f"**{require(page.get('title'), str, f'{where}.title')}**\n{require(page.get('content'), str, f'{where}.content')}\n\n"
+                )
+                stage_page = HelpPage(key, text, requirement)
+                stage_pages.append(stage_page)
+                pages[(name, key)] = stage_page
+
+            stages[name] = HelpStage(name, title, tuple(stage_pages), any(page.requirement for page in stage_pages))
+
+        # Only swap everything in once the whole file is valid
+        self.main_text = main_text
+        self.stages = stages
+        self._pages = pages
+        self.main_options = tuple(main_options)
+        self.stage_options = tuple(stage_options)
+
+    def page(self, stage: str, key: str) -> Optional[HelpPage]:
+        return self._pages.get((stage, key))
+
+    async def accessible_pages(self, stage: str, user_id: int) -> List[HelpPage]:
+        """The pages of a stage the player can see, in order"""
+        help_stage = self.stages.get(stage)
+        if help_stage is None:
+            return []
+        if not help_stage.gated:
+            return list(help_stage.pages)
+
+        profile = await get_user_data("profile", user_id, {})
+        tutorials = profile.get("tutorials", [])
+        if not isinstance(tutorials, list):
+            tutorials = []
+        return [page for page in help_stage.pages if not page.requirement or page.requirement in tutorials]
+
+help_pages = HelpPages()
@@ -0,0 +1,204 @@
+# Leaderboards kept in memory. Each board holds the exact top players for its column, updated from
+# database writes as they happen (files.add_write_listener), so viewing one never queries the
+# database. Boards are reloaded from the database periodically, and early when enough players fell
+# off the bottom that a full page can't be shown any more.
+
+import asyncio
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .files import _ensure_table_exists, add_write_listener, connect_db
+from .logging import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+LEADERBOARD_SIZE = 100  # players shown per board
+LEADERBOARD_CAPACITY = 200  # players tracked per board, the extra absorbs players dropping out
+
+def total_atoms(atoms: Any) -> int:
+    if isinstance(atoms, str):
+        try:
+            atoms = json.loads(atoms)
+        except json.JSONDecodeError:
+            return 0
+    if not isinstance(atoms, dict):
+        return 0
+    return sum(amount for amount in atoms.values() if isinstance(amount, (int, float)))
+
+class Board:
+    """
+    The top players of one column. Invariant: scores holds the exact top len(scores) players, so
+    everyone not in it scores at most the lowest tracked score (unless complete, then nobody is left out).
+
+    Args:
+        name: Board key
+        label: Shown in the board select
+        table: Table the column lives in
+        column: Ranked column
+        value: Turns a written column value into a score, defaults to the value itself
+        default: The column's default, decides its type if the column doesn't exist yet
+        score_sql: SQL expression ranking rows when loading, defaults to the column. Columns ranked
+            by a plain column get an index, computed scores are a full scan
+    """
+
+    def __init__(self, name: str, label: str, table: str, column: str, value: Optional[Callable[[Any], float]] = None, default: Any = 0, score_sql: Optional[str] = None):
+        self.name = name
+        self.label = label
+        self.table = table
+        self.column = column
+        self.value = value or (lambda raw: raw if isinstance(raw, (int, float)) else 0)
+        self.default = default
+        self.score_sql = score_sql
+        self.scores: Dict[int, float] = {}  # {user_id: score}
+        self.complete = False  # every row of the table is in scores
+        self.loaded = False
+        self._ranking: Optional[List[Tuple[int, float]]] = None  # sorted scores, rebuilt after changes
+        self._pending: Optional[List[Tuple[int, float]]] = None  # writes made while a reload was reading
+
+    def update(self, user_id: int, score: float) -> None:
+        if self._pending is not None:
+            self._pending.append((user_id, score))
+        if not self.loaded:
+            return
+
+        if self.complete:
+            self.scores[user_id] = score
+        else:
+            floor = min(self.scores.values()) if self.scores else float("inf")
+            if user_id in self.scores:
+                if score >= floor:
+                    self.scores[user_id] = score
+                else:
+                    # Someone untracked may be above them now
+                    del self.scores[user_id]
+            elif score > floor:
+                self.scores[user_id] = score
+            else:
+                return
+
+        if len(self.scores) > LEADERBOARD_CAPACITY:
+            del self.scores[min(self.scores, key=lambda tracked: (self.scores[tracked], -tracked))]
+            self.complete = False
+        self._ranking = None
+
+    @property
+    def stale(self) -> bool:
+        return not self.loaded or (not self.complete and len(self.scores) < LEADERBOARD_SIZE)
+
+    def ranking(self) -> List[Tuple[int, float]]:
+        """[(user_id, score)], best first, at most LEADERBOARD_SIZE"""
+        if self._ranking is None:
+            self._ranking = sorted(self.scores.items(), key=lambda item: (-item[1], item[0]))[:LEADERBOARD_SIZE]
+        return self._ranking
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based rank, None if the player isn't on the board"""
+        for position, (ranked_id, _) in enumerate(self.ranking(), start=1):
+            if ranked_id == user_id:
+                return position
+        return None
+
+    async def load(self) -> None:
+        self._pending = []
+        try:
+            async with connect_db() as db:
+                await _ensure_table_exists(db, self.table, {self.column: self.default})
+                if self.score_sql is None:
+                    await db.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_{self.column} ON {self.table}({self.column})")
+                    await db.commit()
+                score_sql = self.score_sql or self.column
+                async with db.execute(
+                    f"SELECT id, {score_sql} AS score FROM {self.table} ORDER BY score DESC, id LIMIT ?",
+                    (LEADERBOARD_CAPACITY + 1,)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+
+            self.complete = len(rows) <= LEADERBOARD_CAPACITY
+            self.scores = {user_id: score or 0 for user_id, score in rows[:LEADERBOARD_CAPACITY]}
+            self.loaded = True
+            self._ranking = None
+            pending, self._pending = self._pending, None
+            for user_id, score in pending:
+                self.update(user_id, score)
+        finally:
+            self._pending = None
+
+class Leaderboards:
+    # Reads profile, currency and resets, only adds indexes to them.
+    # Player names come from profile.name, written on every gain.
+
+    def __init__(self):
+        self.boards: Dict[str, Board] = {
+            "xp": Board("xp", "XP", "profile", "xp"),
+            "energy": Board("energy", "Energy", "currency", "energy"),
+            "fission": Board("fission", "Fissions", "resets", "fission"),
+            "atoms": Board(
+                "atoms", "Atoms", "currency", "atoms", value=total_atoms, default={},
+                score_sql="(SELECT COALESCE(SUM(value), 0) FROM json_each(CASE WHEN json_valid(atoms) THEN atoms ELSE '{}' END))"
+            ),
+        }
+        self.names: Dict[int, str] = {}  # {user_id: name} for tracked players
+        self._reload_task: Optional[asyncio.Task] = None
+        add_write_listener(self.on_write)
+
+    def on_write(self, table: str, data: Dict[str, Any]) -> None:
+        user_id = data.get("id")
+        if user_id is None:
+            return
+        for board in self.boards.values():
+            if board.table == table and board.column in data:
+                board.update(user_id, board.value(data[board.column]))
+        if table == "profile" and isinstance(data.get("name"), str):
+            if any(user_id in board.scores for board in self.boards.values()):
+                self.names[user_id] = data["name"]
+
+    async def load(self) -> None:
+        """Reload every board and the names of the players on them"""
+        for board in self.boards.values():
+            await board.load()
+        await self._load_names()
+        metrics.increment("leaderboard_reloads")
+        logger.info(f"Loaded leaderboards ({', '.join(f'{name}: {len(board.scores)}' for name, board in self.boards.items())})")
+
+    async def _load_names(self) -> None:
+        tracked = set()
+        for board in self.boards.values():
+            tracked.update(board.scores)
+        names = {}
+        if tracked:
+            async with connect_db() as db:
+                await _ensure_table_exists(db, "profile", {"name": ""})
+                tracked = list(tracked)
+                for start in range(0, len(tracked), 500):  # stay under SQLite's variable limit
+                    chunk = tracked[start:start + 500]
+                    async with db.execute(
+                        f"SELECT id, name FROM profile WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+                    ) as cursor:
+                        for user_id, name in await cursor.fetchall():
+                            if name:
+                                names[user_id] = name
+        self.names = names
+
+    async def get(self, name: str) -> Board:
+        """A board ready to show, reloading it first if it can't fill a page"""
+        board = self.boards[name]
+        if board.stale:
+            if self._reload_task is None or self._reload_task.done():
+                self._reload_task = asyncio.create_task(self.load())
+            await asyncio.shield(self._reload_task)
+        return board
+
+    def name_of(self, user_id: int) -> str:
+        return self.names.get(user_id, f"Player {str(user_id)[-4:]}")
+
+    async def run_reconciliation(self, interval: float = 300) -> None:
+        """Reload from the database every interval seconds, picks up writes from other processes"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Leaderboard reconciliation failed: {e}")
+
+leaderboards = Leaderboards()
@@ -1,66 +1,174 @@
-# Currently synchronous, but may need async in future
-# Since right now it's minimal
+# Records are handed to a queue on the calling thread and written to the console/files
+# by a QueueListener thread, so the event loop never blocks on file writes or rotation.
 
+import atexit
+import copy
 import functools
+import json
 import logging
 import logging.handlers
+import os
+import queue
 import sys
 import time
 import traceback
 import uuid
 from pathlib import Path
-from typing import Callable, TypeVar
+from typing import Callable, Optional, TypeVar
 
 import discord
 from discord.ext import commands
 
 T = TypeVar('T')
 
-def setup_logging(log_dir: str = "data/logs", log_level: int = logging.INFO) -> None:
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+_exception_formatter = logging.Formatter()
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: when the queue is full the record is dropped and counted."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported_dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Make the record safe to hand to the listener thread. Unlike the base class the traceback is
+        kept apart from the message, in exc_text, so formatters still see it as the exception.
+        """
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+
+        if self.dropped > self._reported_dropped:
+            # Report drops once there is room again, so the gap shows up in the logs
+            newly_dropped = self.dropped - self._reported_dropped
+            self._reported_dropped = self.dropped
+            warning = logging.LogRecord(
+                "utils.logging", logging.WARNING, __file__, 0,
+                f"Log queue full, dropped {newly_dropped} records ({self.dropped} total)", None, None
+            )
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                pass
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for downstream log parsing."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:  # already formatted by DroppingQueueHandler.prepare
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+def setup_logging(log_dir: str = "data/logs", log_level: int = logging.INFO, json_format: bool = None, queue_size: int = 10_000) -> None:
     """Set up the logging configuration for the bot.
     
     Args:
         log_dir (str): Directory to store log files
         log_level (int): Logging level for the application
+        json_format (bool): Write log files as JSON lines. Defaults to the LOG_FORMAT=json environment variable
+        queue_size (int): Maximum records waiting to be written before new ones are dropped
     """
+    global _listener, _queue_handler
+
+    if _listener is not None:
+        return
+
+    if json_format is None:
+        json_format = os.getenv("LOG_FORMAT", "").lower() == "json"
+
     log_path = Path(log_dir)
     log_path.mkdir(parents=True, exist_ok=True)
 
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s | %(name)-12s | %(levelname)-8s | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    # Launcher workers each rotate their own files, processes sharing one would clobber each other's rollovers
+    worker = os.getenv("CLUSTER_WORKER")
+    suffix = f".worker{worker}" if worker is not None else ""
+
+    if json_format:
+        detailed_formatter = JsonFormatter()
+    else:
+        detailed_formatter = logging.Formatter(
+            '%(asctime)s | %(name)-12s | %(levelname)-8s | %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     console_formatter = logging.Formatter(
         '%(levelname)-8s | %(name)-12s | %(message)s'
     )
 
-    root_logger = logging.getLogger()
-    root_logger.setLevel(log_level)
-
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
 
     file_handler = logging.handlers.TimedRotatingFileHandler(
-        filename=log_path / "bot.log",
+        filename=log_path / f"bot{suffix}.log",
         when="midnight",
         interval=1,
         backupCount=30,  # Keep 30 days of logs
         encoding="utf-8"
     )
     file_handler.setFormatter(detailed_formatter)
-    root_logger.addHandler(file_handler)
 
     error_handler = logging.handlers.RotatingFileHandler(
-        filename=log_path / "error.log",
+        filename=log_path / f"error{suffix}.log",
         maxBytes=10_000_000,  # 10MB
         backupCount=5,
         encoding="utf-8"
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(detailed_formatter)
-    root_logger.addHandler(error_handler)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, error_handler,
+        respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_level)
+    root_logger.addHandler(_queue_handler)
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()  # processes everything already queued before returning
+    _listener = None
+    _queue_handler = None
+
+def get_dropped_log_count() -> int:
+    """Number of log records dropped because the queue was full."""
+    return _queue_handler.dropped if _queue_handler else 0
 
 def get_logger(name: str) -> logging.Logger:
     """Get a logger with the given name.
@@ -84,9 +192,24 @@ def handle_errors():
             if not interaction:
                 return await func(*args, **kwargs)
 
+            from .metrics import current_command, metrics, track_command
+            from .responses import auto_defer
+
+            if current_command.get() is None:
+                # Entry point that didn't go through universal_command (group subcommands, buttons, selects)
+                if interaction.command is not None:
+                    command_name = interaction.command.qualified_name
+                else:
+                    command_name = f"component:{func.__name__}"
+                run = functools.partial(track_command, command_name, func)
+            else:
+                run = func
+
             try:
-                return await func(*args, **kwargs)
+                async with auto_defer(interaction):
+                    return await run(*args, **kwargs)
             except Exception as e:
+                metrics.record_error(current_command.get() or func.__name__)
                 logger = get_logger(func.__module__)
                 
                 error_id = f"E{int(time.time())}-{str(uuid.uuid4())[:8]}"
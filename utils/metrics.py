@@ -0,0 +1,181 @@
+# In-process metrics: per-command latency, DB calls and time, cache hit rates and errors.
+# Exposed in Prometheus text format on a local port and through the /stats admin view.
+
+import bisect
+import contextvars
+import functools
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Name of the command the current task is handling, set by universal_command/handle_errors
+current_command: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_command", default=None)
+_db_depth: contextvars.ContextVar[int] = contextvars.ContextVar("db_depth", default=0)
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+class Metrics:
+    def __init__(self):
+        self.command_latency: Dict[str, Histogram] = {}
+        self.command_errors: Dict[str, int] = {}
+        self.db_calls: Dict[Tuple[str, str], int] = {}  # {(command, operation): calls}
+        self.db_time: Dict[Tuple[str, str], float] = {}  # {(command, operation): seconds}
+        self.cache_hits: Dict[str, int] = {}
+        self.cache_misses: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.loop_lag = Histogram()
+        self.in_flight = 0  # commands currently running, drained on shutdown
+
+    def observe_command(self, command: str, elapsed: float) -> None:
+        self.command_latency.setdefault(command, Histogram()).observe(elapsed)
+
+    def record_error(self, command: str) -> None:
+        self.command_errors[command] = self.command_errors.get(command, 0) + 1
+
+    def record_db(self, operation: str, elapsed: float) -> None:
+        key = (current_command.get() or "none", operation)
+        self.db_calls[key] = self.db_calls.get(key, 0) + 1
+        self.db_time[key] = self.db_time.get(key, 0.0) + elapsed
+
+    def cache_hit(self, cache: str) -> None:
+        self.cache_hits[cache] = self.cache_hits.get(cache, 0) + 1
+
+    def cache_miss(self, cache: str) -> None:
+        self.cache_misses[cache] = self.cache_misses.get(cache, 0) + 1
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def db_per_command(self) -> Dict[str, Tuple[int, float]]:
+        """{command: (db calls, db seconds)} summed over operations"""
+        totals = {}
+        for (command, _), calls in self.db_calls.items():
+            calls_total, time_total = totals.get(command, (0, 0.0))
+            totals[command] = (calls_total + calls, time_total + self.db_time[(command, _)])
+        return totals
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+
+        lines.append("# HELP planck_command_latency_seconds Command handler latency")
+        lines.append("# TYPE planck_command_latency_seconds histogram")
+        for command, histogram in sorted(self.command_latency.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'planck_command_latency_seconds_bucket{{command="{command}",le="{bound}"}} {cumulative}')
+            lines.append(f'planck_command_latency_seconds_bucket{{command="{command}",le="+Inf"}} {histogram.count}')
+            lines.append(f'planck_command_latency_seconds_sum{{command="{command}"}} {histogram.total}')
+            lines.append(f'planck_command_latency_seconds_count{{command="{command}"}} {histogram.count}')
+
+        lines.append("# HELP planck_command_errors_total Unhandled errors per command")
+        lines.append("# TYPE planck_command_errors_total counter")
+        for command, errors in sorted(self.command_errors.items()):
+            lines.append(f'planck_command_errors_total{{command="{command}"}} {errors}')
+
+        lines.append("# HELP planck_db_calls_total Database calls per command and operation")
+        lines.append("# TYPE planck_db_calls_total counter")
+        for (command, operation), calls in sorted(self.db_calls.items()):
+            lines.append(f'planck_db_calls_total{{command="{command}",operation="{operation}"}} {calls}')
+
+        lines.append("# HELP planck_db_seconds_total Time spent in database calls per command and operation")
+        lines.append("# TYPE planck_db_seconds_total counter")
+        for (command, operation), seconds in sorted(self.db_time.items()):
+            lines.append(f'planck_db_seconds_total{{command="{command}",operation="{operation}"}} {seconds}')
+
+        lines.append("# HELP planck_cache_requests_total Cache lookups by result")
+        lines.append("# TYPE planck_cache_requests_total counter")
+        for cache in sorted(set(self.cache_hits) | set(self.cache_misses)):
+            lines.append(f'planck_cache_requests_total{{cache="{cache}",result="hit"}} {self.cache_hits.get(cache, 0)}')
+            lines.append(f'planck_cache_requests_total{{cache="{cache}",result="miss"}} {self.cache_misses.get(cache, 0)}')
+
+        lines.append("# HELP planck_commands_in_flight Commands currently running")
+        lines.append("# TYPE planck_commands_in_flight gauge")
+        lines.append(f"planck_commands_in_flight {self.in_flight}")
+
+        lines.append("# HELP planck_loop_lag_seconds Event loop scheduling lag")
+        lines.append("# TYPE planck_loop_lag_seconds histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(self.loop_lag.buckets, self.loop_lag.counts):
+            cumulative += bucket_count
+            lines.append(f'planck_loop_lag_seconds_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'planck_loop_lag_seconds_bucket{{le="+Inf"}} {self.loop_lag.count}')
+        lines.append(f"planck_loop_lag_seconds_sum {self.loop_lag.total}")
+        lines.append(f"planck_loop_lag_seconds_count {self.loop_lag.count}")
+
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE planck_{name}_total counter")
+            lines.append(f"planck_{name}_total {value}")
+
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+async def track_command(name: str, func: Callable, *args, **kwargs):
+    """Run a command with its name set as the current command and record its latency"""
+    token = current_command.set(name)
+    start = time.perf_counter()
+    metrics.in_flight += 1
+    try:
+        return await func(*args, **kwargs)
+    finally:
+        metrics.in_flight -= 1
+        metrics.observe_command(name, time.perf_counter() - start)
+        current_command.reset(token)
+
+def track_db(func: Callable) -> Callable:
+    """Record calls and time for a utils/files.py operation, counting only the outermost call"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        depth = _db_depth.get()
+        token = _db_depth.set(depth + 1)
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _db_depth.reset(token)
+            if depth == 0:
+                metrics.record_db(func.__name__, time.perf_counter() - start)
+    return wrapper
+
+async def start_metrics_server(port: int, host: str = "127.0.0.1") -> web.AppRunner:
+    """Serve /metrics in Prometheus text format on a local port"""
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics available at http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,110 @@
+# Event loop health: picks the loop implementation, measures scheduling lag and catches
+# stalls while they happen. A watchdog thread samples the loop thread's stack when the loop
+# stops responding, so the blocking code (and the command it was running for) ends up in the error log.
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from .logging import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+def install_event_loop(name: str = "asyncio") -> str:
+    """
+    Set the event loop policy before the loop is created.
+
+    Args:
+        name: "uvloop" to use uvloop if it's installed, anything else keeps the stock asyncio loop
+
+    Returns:
+        The loop actually in use
+    """
+    if name != "uvloop":
+        return "asyncio"
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("uvloop was requested but isn't installed, using the asyncio loop")
+        return "asyncio"
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+def _command_in_stack(frame) -> Optional[str]:
+    """Find the command being handled by walking up to the track_command frame"""
+    while frame is not None:
+        if frame.f_code.co_name == "track_command" and "name" in frame.f_locals:
+            return frame.f_locals["name"]
+        frame = frame.f_back
+    return None
+
+class LoopMonitor:
+    """
+    Args:
+        interval: How often the loop heartbeat runs (seconds)
+        threshold: Lag above which the loop counts as stalled (seconds)
+        debug_slow_callbacks: Also turn on asyncio debug mode, which logs every callback slower
+            than the threshold. Useful for hunting, but debug mode has overhead
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, debug_slow_callbacks: bool = False):
+        self.interval = interval
+        self.threshold = threshold
+        self.debug_slow_callbacks = debug_slow_callbacks
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+
+        if self.debug_slow_callbacks:
+            loop.slow_callback_duration = self.threshold
+            loop.set_debug(True)
+
+        self._heartbeat = time.monotonic()
+        self._task = loop.create_task(self._measure_lag())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Loop monitor started (stall threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _measure_lag(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            metrics.loop_lag.observe(max(0.0, now - expected))
+
+    def _watch(self):
+        reported_heartbeat = None
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled_for = time.monotonic() - heartbeat - self.interval
+            if stalled_for < self.threshold or heartbeat == reported_heartbeat:
+                continue
+
+            # Report each stall once, while it is still happening
+            reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+
+            self.stalls += 1
+            metrics.increment("loop_stalls")
+            command = _command_in_stack(frame) or "unknown"
+            stack = "".join(traceback.format_stack(frame))
+            logger.error(f"Event loop stalled for {stalled_for * 1000:.0f}ms+ while handling {command}:\n{stack}")
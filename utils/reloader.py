@@ -0,0 +1,125 @@
+# Development helper: reloads cogs when their source changes.
+# Uses watchfiles (inotify on Linux) when it's installed, otherwise falls back to polling mtimes.
+
+import asyncio
+import os
+from typing import Dict, Set
+
+from discord.ext import commands
+
+from .commands import command_signatures, sync_command_tree
+from .logging import get_logger
+
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+logger = get_logger(__name__)
+
+class CogReloader:
+    """
+    Watches a cog directory and hot reloads only the extensions that changed.
+
+    Bursts of saves are debounced into a single reload, and the command tree is only
+    re-synced when the reloaded cog's command signatures actually changed.
+    """
+
+    def __init__(self, bot: commands.Bot, directory: str = "cogs", debounce: float = 0.5, poll_interval: float = 1.0):
+        self.bot = bot
+        self.directory = directory
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._pending: Set[str] = set()
+        self._changed = asyncio.Event()
+
+    def _extension_for(self, path: str) -> str:
+        filename = os.path.basename(path)
+        if not filename.endswith(".py") or filename.startswith("__"):
+            return None
+        return f"{self.directory.replace(os.sep, '.')}.{filename[:-3]}"
+
+    def _queue(self, path: str) -> None:
+        extension = self._extension_for(path)
+        if extension:
+            self._pending.add(extension)
+            self._changed.set()
+
+    async def run(self):
+        if awatch is not None:
+            logger.info(f"Watching {os.path.abspath(self.directory)} for changes (inotify)")
+            watcher = self._watch_events()
+        else:
+            logger.info(f"Watching {os.path.abspath(self.directory)} for changes (polling every {self.poll_interval}s)")
+            watcher = self._watch_polling()
+
+        await asyncio.gather(watcher, self._process())
+
+    async def _watch_events(self):
+        async for changes in awatch(self.directory):
+            for _, path in changes:
+                self._queue(path)
+
+    def _scan(self) -> Dict[str, float]:
+        mtimes = {}
+        for entry in os.scandir(self.directory):
+            if not self._extension_for(entry.path):
+                continue
+            try:
+                mtimes[entry.path] = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue  # deleted mid-scan, the next scan reports it as removed
+        return mtimes
+
+    async def _watch_polling(self):
+        # Added, modified and deleted files are all queued, reload() loads, reloads or unloads by
+        # whether the file still exists, like it does for watchfiles events
+        mtimes = self._scan()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = self._scan()
+            for path, mtime in current.items():
+                if path not in mtimes or mtime > mtimes[path]:
+                    self._queue(path)
+            for path in mtimes.keys() - current.keys():
+                self._queue(path)
+            mtimes = current
+
+    async def _process(self):
+        while True:
+            await self._changed.wait()
+
+            # Wait until saves stop arriving before reloading
+            while True:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=self.debounce)
+                except asyncio.TimeoutError:
+                    break
+
+            extensions, self._pending = self._pending, set()
+            for extension in sorted(extensions):
+                await self.reload(extension)
+
+    async def reload(self, extension: str) -> None:
+        path = os.path.join(*extension.split(".")) + ".py"
+        before = command_signatures(self.bot, extension)
+
+        try:
+            if not os.path.exists(path):
+                if extension in self.bot.extensions:
+                    await self.bot.unload_extension(extension)
+                    logger.info(f"Unloaded {extension}")
+            elif extension in self.bot.extensions:
+                await self.bot.reload_extension(extension)
+                logger.info(f"Reloaded {extension}")
+            else:
+                await self.bot.load_extension(extension)
+                logger.info(f"Loaded {extension}")
+        except Exception as e:
+            logger.error(f"Error reloading {extension}: {e}")
+            return
+
+        if command_signatures(self.bot, extension) != before:
+            logger.info(f"{extension} command signatures changed")
+            await sync_command_tree(self.bot)
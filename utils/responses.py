@@ -0,0 +1,118 @@
+# Discord drops interactions that aren't acknowledged within 3 seconds. Handlers respond once all
+# their work is done, which under load can be too late. While a handler runs, the interaction's
+# response is swapped for AutoDeferResponse: if nothing has been sent when the budget runs out it
+# defers, and whatever the handler sends afterwards goes out as a followup instead.
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import discord
+from dotenv import load_dotenv
+
+from .logging import get_logger
+from .metrics import current_command, metrics
+
+logger = get_logger(__name__)
+
+load_dotenv()
+DEFER_BUDGET = float(os.getenv("DEFER_BUDGET", "2.0"))  # seconds before deferring, 0 turns it off
+
+class AutoDeferResponse:
+    """
+    Stands in for interaction.response. Anything not overridden here is passed to the real response.
+
+    Args:
+        interaction: The interaction being handled
+        response: Its real InteractionResponse
+    """
+
+    def __init__(self, interaction: discord.Interaction, response: discord.InteractionResponse):
+        self._interaction = interaction
+        self._response = response
+        self._lock = asyncio.Lock()  # a response and the deferral can't both go out
+        self.deferred = False
+
+    def __getattr__(self, name: str):
+        return getattr(self._response, name)
+
+    def is_done(self) -> bool:
+        # Handlers that check this before responding get the followup path of their own accord
+        return self._response.is_done()
+
+    async def auto_defer(self, started: float) -> None:
+        async with self._lock:
+            if self._response.is_done():
+                return
+            if self._interaction.type == discord.InteractionType.component:
+                # Acknowledges the click without changing the message, edit_message edits it later
+                await self._response.defer()
+            else:
+                await self._response.defer(thinking=True)
+            self.deferred = True
+
+        metrics.increment("auto_defers")
+        logger.debug(f"Deferred {current_command.get() or 'interaction'} after {time.perf_counter() - started:.2f}s")
+
+    async def defer(self, **kwargs) -> None:
+        async with self._lock:
+            if not self.deferred:
+                await self._response.defer(**kwargs)
+
+    async def send_message(self, content: Optional[str] = None, **kwargs) -> None:
+        async with self._lock:
+            if not self.deferred:
+                return await self._response.send_message(content, **kwargs)
+        kwargs.pop("delete_after", None)  # followups can't be deleted on a timer
+        await self._interaction.followup.send(content, **kwargs)
+
+    async def edit_message(self, **kwargs) -> None:
+        async with self._lock:
+            if not self.deferred:
+                return await self._response.edit_message(**kwargs)
+        kwargs.pop("delete_after", None)
+        await self._interaction.edit_original_response(**kwargs)
+
+    async def send_modal(self, modal: discord.ui.Modal) -> None:
+        async with self._lock:
+            if not self.deferred:
+                return await self._response.send_modal(modal)
+        # A modal can only be the first response, so there is no way to show it any more
+        metrics.increment("auto_defer_missed_modals")
+        await self._interaction.followup.send("That took too long to open, please try again.", ephemeral=True)
+
+@asynccontextmanager
+async def auto_defer(interaction: discord.Interaction, budget: Optional[float] = None):
+    """
+    Defer the interaction if the block hasn't responded within the budget.
+    Nested uses are no-ops, the outermost one (the entry point) owns the timer.
+
+    Args:
+        interaction: The interaction being handled
+        budget: Seconds to wait before deferring, defaults to DEFER_BUDGET
+    """
+    budget = DEFER_BUDGET if budget is None else budget
+    response = interaction.response
+    if budget <= 0 or isinstance(response, AutoDeferResponse) or response.is_done():
+        yield
+        return
+
+    proxy = AutoDeferResponse(interaction, response)
+    interaction._cs_response = proxy
+    started = time.perf_counter()
+
+    async def fire():
+        await asyncio.sleep(budget)
+        try:
+            await proxy.auto_defer(started)
+        except discord.HTTPException as e:
+            logger.warning(f"Auto defer failed: {e}")
+
+    timer = asyncio.create_task(fire())
+    try:
+        yield
+    finally:
+        timer.cancel()
+        interaction._cs_response = response
@@ -0,0 +1,121 @@
+# Persistent component routing. Buttons and selects carry everything needed to handle them in
+# their custom_id ("r:<action>:<user_id>:<arg>:<arg>"), and one DynamicItem registered on the bot
+# dispatches every click to the handler registered for the action. Nothing is kept per message,
+# so memory doesn't grow with messages sent and buttons keep working across restarts.
+
+import re
+from typing import Callable, Dict, List, Optional, Set
+
+import discord
+
+from .logging import get_logger
+from .responses import auto_defer
+
+logger = get_logger(__name__)
+
+ROUTE_PREFIX = "r"
+MAX_CUSTOM_ID_LENGTH = 100
+
+_routes: Dict[str, Callable] = {}
+_unmoderated: Set[str] = set()  # actions that skip the moderation precheck
+
+def route(action: str, moderated: bool = True):
+    """
+    Register a handler for routed components with this action.
+    The handler is called as handler(interaction, bot, *args) with args as strings.
+
+    Args:
+        action: Route name, the second part of the custom_id
+        moderated: Run the ban and captcha prechecks before the handler. Routed buttons stay
+            clickable on messages of any age, so only turn this off for the captcha screen itself
+    """
+    def decorator(func):
+        _routes[action] = func
+        if moderated:
+            _unmoderated.discard(action)
+        else:
+            _unmoderated.add(action)
+        return func
+    return decorator
+
+def routed_id(action: str, user_id: int, *args) -> str:
+    """
+    Args:
+        action: Registered route name
+        user_id: The only user allowed to use the component, 0 for anyone
+        args: Extra values passed to the handler, converted to strings
+
+    Returns:
+        The custom_id for the component
+    """
+    parts = [ROUTE_PREFIX, action, str(user_id)]
+    for arg in args:
+        arg = str(arg)
+        if ":" in arg:
+            raise ValueError(f"Route argument {arg!r} can't contain ':'")
+        parts.append(arg)
+    custom_id = ":".join(parts)
+    if len(custom_id) > MAX_CUSTOM_ID_LENGTH:
+        raise ValueError(f"custom_id {custom_id!r} is longer than {MAX_CUSTOM_ID_LENGTH} characters")
+    return custom_id
+
+def is_routed(custom_id: Optional[str]) -> bool:
+    return bool(custom_id) and custom_id.startswith(f"{ROUTE_PREFIX}:")
+
+def routed_button(action: str, *args, user_id: int, label: str, style: discord.ButtonStyle = discord.ButtonStyle.secondary, disabled: bool = False) -> discord.ui.Button:
+    """A button that runs the route's handler when clicked"""
+    return discord.ui.Button(label=label, style=style, disabled=disabled, custom_id=routed_id(action, user_id, *args))
+
+def routed_select(action: str, *args, user_id: int, options: List[discord.SelectOption], placeholder: str = None) -> discord.ui.Select:
+    """A select that runs the route's handler when changed, the chosen values are in interaction.data["values"]"""
+    return discord.ui.Select(placeholder=placeholder, options=options, custom_id=routed_id(action, user_id, *args))
+
+class RoutedItem(discord.ui.DynamicItem[discord.ui.Item], template=rf"{ROUTE_PREFIX}:(?P<action>\w+):(?P<user_id>\d+)(?P<args>(?::[^:]*)*)"):
+    def __init__(self, item: discord.ui.Item, action: str, user_id: int, args: List[str]):
+        super().__init__(item)
+        self.action = action
+        self.user_id = user_id
+        self.args = args
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Item, match: re.Match):
+        args = match["args"].split(":")[1:] if match["args"] else []
+        return cls(item, match["action"], int(match["user_id"]), args)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if self.user_id and interaction.user.id != self.user_id:
+            await interaction.response.send_message("This isn't your menu, run the command yourself to get one.", ephemeral=True)
+            return False
+        return True
+
+    async def callback(self, interaction: discord.Interaction):
+        handler = _routes.get(self.action)
+        if handler is None:
+            logger.warning(f"No route registered for {self.action!r} ({self.custom_id})")
+            return await interaction.response.send_message("This button is no longer available.", ephemeral=True)
+        from .moderation import precheck
+
+        async with auto_defer(interaction):
+            if self.action not in _unmoderated and await precheck(interaction):
+                return
+            await handler(interaction, interaction.client, *self.args)
+
+class ScreenView(discord.ui.LayoutView):
+    """
+    LayoutView for bot screens. discord.py only has to keep it in its view store while it has
+    clickable components with closure callbacks, a screen made of routed (or disabled) components
+    isn't stored at all.
+    """
+
+    def __init__(self):
+        super().__init__(timeout=None)
+
+    def is_dispatchable(self) -> bool:
+        return any(
+            item.is_dispatchable() and not getattr(item, "disabled", False) and not is_routed(getattr(item, "custom_id", None))
+            for item in self.walk_children()
+        )
+
+def setup_router(bot: discord.Client) -> None:
+    """Register the routed component dispatcher, call once before the bot connects"""
+    bot.add_dynamic_items(RoutedItem)
@@ -0,0 +1,171 @@
+import asyncio
+import random
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from .logging import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+MAX_EMBEDS_PER_MESSAGE = 10  # Discord limits
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+MAX_FIELD_VALUE_CHARS = 1024
+
+def _truncate_fields(embed: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of the embed with field values cut to Discord's per-field limit"""
+    if not any(len(str(field.get("value", ""))) > MAX_FIELD_VALUE_CHARS for field in embed.get("fields", ())):
+        return embed
+    fields = []
+    for field in embed["fields"]:
+        value = str(field.get("value", ""))
+        if len(value) > MAX_FIELD_VALUE_CHARS:
+            field = {**field, "value": value[:MAX_FIELD_VALUE_CHARS - 1] + "…"}
+        fields.append(field)
+    return {**embed, "fields": fields}
+
+def _embed_length(embed: Dict[str, Any]) -> int:
+    """Characters Discord counts towards the per-message total"""
+    length = len(embed.get("title", "")) + len(embed.get("description", ""))
+    length += len(embed.get("footer", {}).get("text", "")) + len(embed.get("author", {}).get("name", ""))
+    for field in embed.get("fields", ()):
+        length += len(str(field.get("name", ""))) + len(str(field.get("value", "")))
+    return length
+
+class WebhookDispatcher:
+    """
+    Delivers webhook embeds off the request path.
+
+    Embeds are queued and a single background worker posts them over one persistent session,
+    packing consecutive embeds bound for the same URL (up to 10, and 6000 characters) into each
+    message and backing off on rate limits. Field values are cut to 1024 characters when queued,
+    and a batch Discord rejects with a 400 is resent one embed at a time so only the bad embed is
+    lost. The queue is the only buffer: while the worker is stuck retrying, new embeds
+    wait in it, and once queue_size are waiting further embeds are dropped rather than blocking the
+    moderation code that sends them (counted in dropped and the webhooks_dropped metric).
+
+    Args:
+        max_retries: Attempts per message after the first, on 429s and 5xx responses
+        queue_size: Embeds that can wait for delivery before new ones are dropped
+    """
+
+    def __init__(self, max_retries: int = 5, queue_size: int = 1000):
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    def send(self, url: Optional[str], embed: Dict[str, Any]) -> None:
+        """Queue an embed for delivery. Never blocks the caller."""
+        if not url:
+            logger.warning(f"Webhook URL not configured, dropping embed: {embed.get('title')}")
+            return
+
+        try:
+            self._queue.put_nowait((url, _truncate_fields(embed)))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            metrics.increment("webhooks_dropped")
+            logger.error(f"Webhook queue full, dropped embed: {embed.get('title')} ({self.dropped} dropped total)")
+            return
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def _run(self):
+        carry = None  # taken from the queue while filling the last batch, but bound for another URL
+        while True:
+            url, embed = carry or await self._queue.get()
+            carry = None
+            embeds = [embed]
+            length = _embed_length(embed)
+            # Only ever hold one message's worth outside the queue, so queue_size bounds the backlog
+            while len(embeds) < MAX_EMBEDS_PER_MESSAGE and not self._queue.empty():
+                next_url, next_embed = self._queue.get_nowait()
+                next_length = _embed_length(next_embed)
+                if next_url != url or length + next_length > MAX_EMBED_CHARS_PER_MESSAGE:
+                    carry = (next_url, next_embed)
+                    break
+                embeds.append(next_embed)
+                length += next_length
+
+            try:
+                if await self._post(url, embeds) == 400 and len(embeds) > 1:
+                    # Resend one by one so a single bad embed doesn't cost the rest of the batch
+                    for single in embeds:
+                        await self._post(url, [single])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to send webhook notification ({len(embeds)} embeds): {e}")
+            finally:
+                for _ in embeds:
+                    self._queue.task_done()
+
+    async def _post(self, url: str, embeds: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Post one message, retrying 429s and 5xx responses.
+
+        Returns:
+            The status of the last response, None if every attempt failed
+        """
+        session = await self._get_session()
+
+        for attempt in range(self.max_retries + 1):
+            async with session.post(url, json={"embeds": embeds}) as response:
+                if response.status in (200, 204):
+                    # Respect the bucket before the next request instead of waiting for a 429
+                    if response.headers.get("X-RateLimit-Remaining") == "0":
+                        await asyncio.sleep(float(response.headers.get("X-RateLimit-Reset-After", 0)))
+                    return response.status
+
+                if response.status == 429:
+                    retry_after = response.headers.get("Retry-After")
+                    if retry_after is None:
+                        try:
+                            retry_after = (await response.json()).get("retry_after", 1)
+                        except (aiohttp.ContentTypeError, ValueError):
+                            retry_after = 1
+                    delay = float(retry_after)
+                elif response.status >= 500:
+                    delay = min(30.0, 2 ** attempt) + random.random()
+                else:
+                    logger.error(f"Failed to send webhook notification ({len(embeds)} embeds): {response.status}")
+                    return response.status
+
+            if attempt == self.max_retries:
+                break
+            logger.warning(f"Webhook returned {response.status}, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        logger.error(f"Giving up on webhook after {self.max_retries} retries ({len(embeds)} embeds dropped)")
+        return None
+
+    async def flush(self, timeout: float = 10.0) -> None:
+        """Wait until everything queued so far has been delivered (or given up on)"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook flush timed out with {self._queue.qsize()} embeds queued")
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Flush the queue, stop the worker and close the session"""
+        await self.flush(timeout)
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+webhook_dispatcher = WebhookDispatcher()